@@ -4,41 +4,53 @@ from flask import Flask
 from flask_cors import CORS
 import os
 from config import Config # Importeer de Config class
-from database import db, init_db # Importeer db en init_db functie
-from seed_data import seed_initial_data # Importeer seed functie
+from database import init_db # Importeer init_db functie
 
-app = Flask(__name__)
-CORS(app) 
+def create_app(config_object=Config, start_scheduler=False):
+    """App factory: configuratie, database, routes en CLI; bij het opstarten wordt geen data bewerkt.
 
-# Configureer de app met de instellingen uit config.py
-app.config.from_object(Config)
+    Tabellen en demo data komen van 'flask --app app seed'; met start_scheduler=True vult een
+    achtergrond thread daarna elk nieuw uur aan (zie services/scheduler.py).
+    """
+    app = Flask(__name__)
+    CORS(app)
 
-# Initialiseer de database met de app
-init_db(app)
+    # Configureer de app met de instellingen uit config.py
+    app.config.from_object(config_object)
 
-# Registreer Blueprints voor routes
-from routes.city_routes import city_bp # Importeer blueprint voor steden
-from routes.energy_routes import energy_bp # Importeer blueprint voor energie
+    # Initialiseer de database met de app
+    init_db(app)
 
-app.register_blueprint(city_bp)
-app.register_blueprint(energy_bp)
+    # Metrics per route (latency, SQL statements en SQL tijd) en de slow-query log
+    from instrumentation import init_instrumentation
+    init_instrumentation(app)
 
-# Simpele test route 
-@app.route('/')
-def hello_world():
-    return 'Hello from Flask Backend (Modular Version)!'
+    # Registreer Blueprints voor routes
+    from routes.city_routes import city_bp # Importeer blueprint voor steden
+    from routes.energy_routes import energy_bp # Importeer blueprint voor energie
+    from routes.inventory_routes import inventory_bp # Importeer blueprint voor de inventaris (gepagineerd)
+
+    app.register_blueprint(city_bp)
+    app.register_blueprint(energy_bp)
+    app.register_blueprint(inventory_bp)
+
+    # Registreer CLI commando's (flask --app app <commando>)
+    from cli import register_commands
+    register_commands(app)
+
+    # Simpele test route
+    @app.route('/')
+    def hello_world():
+        return 'Hello from Flask Backend (Modular Version)!'
+
+    # Catch-up scheduler en de lag gauge
+    from services.scheduler import init_scheduler
+    init_scheduler(app, start=start_scheduler)
+
+    return app
 
 if __name__ == '__main__':
-    with app.app_context(): # Zorgt ervoor dat alle database operaties de context hebben
-        print("Starting database operations...")
-        # --- BELANGRIJK: ZORG DAT DEZE LIJN ALLEEN AANSTAAT ALS JE ECHT WIL RESETTEN! ---
-        # db.drop_all() # UNCOMMENT DIT TIJDELIJK OM ALLE TABELLEN EN DATA TE WISSEN
-        db.create_all() # Zorgt dat alle tabellen bestaan (geen migraties hier, alleen aanmaken)
-        print("Database tables checked/created.")
-        
-        # Roep de seed functie aan om data te genereren
-        # Deze functie beheert nu zelf of data verwijderd en/of aangevuld moet worden
-        seed_initial_data() # Roep de seed functie aan, de 'app' context is al gezet
-        print("Demo data seeding complete.")
-        
-    app.run(debug=True)
\ No newline at end of file
+    # Eenmalig (of na een reset) eerst: flask --app app seed
+    # De debug reloader start dit bestand twee keer; alleen het kindproces (WERKZEUG_RUN_MAIN) start de scheduler
+    app = create_app(start_scheduler=os.environ.get('WERKZEUG_RUN_MAIN') == 'true')
+    app.run(debug=True)
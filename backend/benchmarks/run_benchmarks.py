@@ -0,0 +1,276 @@
+# backend/benchmarks/run_benchmarks.py
+"""Reproduceerbare performance benchmarks van de backend op meerdere dataschalen.
+
+Gebruik (vanuit backend/):
+    python benchmarks/run_benchmarks.py run --scales 10x40d,1kx40d
+    python benchmarks/run_benchmarks.py run --database-url postgresql://... --scales 50kx365d
+    python benchmarks/run_benchmarks.py compare benchmarks/results/oud.json benchmarks/results/nieuw.json
+
+Standaard draait alles tegen een tijdelijke SQLite database; de grote schalen zijn bedoeld voor een lokale PostgreSQL.
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'results')
+
+SCALES = {
+    '10x40d': {"units": 10, "days": 40},
+    '1kx40d': {"units": 1000, "days": 40},
+    '1kx365d': {"units": 1000, "days": 365},
+    '50kx40d': {"units": 50000, "days": 40},
+    '50kx365d': {"units": 50000, "days": 365},
+}
+UNITS_PER_AREA = 50
+AREAS_PER_CITY = 10
+RANDOM_SEED = 42
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+def _peak_memory_mb():
+    # ru_maxrss is de piek van het hele proces (in KiB op Linux, bytes op macOS); elke schaal draait daarom apart
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def _percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(fraction * len(ordered)) - 1))]
+
+def _build_inventory(db, units):
+    from models import City, Area, LightingUnit
+    from seed_data import UNIT_TEMPLATES
+
+    n_areas = max(1, math.ceil(units / UNITS_PER_AREA))
+    n_cities = max(1, math.ceil(n_areas / AREAS_PER_CITY))
+    db.session.execute(City.__table__.insert(), [{"id": i + 1, "name": f"Bench City {i + 1}"} for i in range(n_cities)])
+    db.session.execute(Area.__table__.insert(), [
+        {"id": i + 1, "city_id": i // AREAS_PER_CITY + 1, "name": f"Bench Area {i + 1}", "description": "benchmark"}
+        for i in range(n_areas)
+    ])
+    unit_rows = []
+    for i in range(units):
+        unit_type, street, power_watt = UNIT_TEMPLATES[i % len(UNIT_TEMPLATES)]
+        unit_rows.append({"id": i + 1, "area_id": i // UNITS_PER_AREA + 1, "unit_type": unit_type,
+                          "location": f"{street} {i + 1}", "power_watt": power_watt})
+    db.session.execute(LightingUnit.__table__.insert(), unit_rows)
+    db.session.commit()
+    return n_areas, n_cities
+
+def _timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+def _measure_route(client, method, url, repetitions, **kwargs):
+    samples = []
+    status = None
+    for _ in range(repetitions):
+        started = time.perf_counter()
+        response = client.open(url, method=method, **kwargs)
+        response.get_data()
+        samples.append(time.perf_counter() - started)
+        status = response.status_code
+    return {
+        "status": status,
+        "p50_ms": round(_percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "repetitions": repetitions,
+    }
+
+def run_scale(app, name, scale, repetitions):
+    import numpy as np
+    from database import db
+    from models import LightingUnit
+    from seed_data import generate_consumption_batches
+    from services.bulk_loader import write_consumption_batches
+    from services.rollup_service import refresh_rollups
+    from services.recommendation_engine import refresh_recommendations
+
+    result = {"units": scale["units"], "days": scale["days"]}
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        app.extensions.pop('energy_cache', None)
+        app.extensions.pop('unit_registry', None)
+        n_areas, n_cities = _build_inventory(db, scale["units"])
+        result.update({"areas": n_areas, "cities": n_cities})
+
+        # Seeding: vectorized generator + bulk loader
+        end_time = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=2)
+        units = db.session.query(LightingUnit.id, LightingUnit.unit_type, LightingUnit.power_watt).order_by(LightingUnit.id).all()
+        rng = np.random.default_rng(RANDOM_SEED)
+        seed_stats = write_consumption_batches(
+            generate_consumption_batches(units, end_time - timedelta(days=scale["days"]), end_time, rng),
+            label=f"benchmark {name}"
+        )
+        result["seed"] = {"rows": seed_stats["rows"], "seconds": round(seed_stats["seconds"], 3),
+                          "rows_per_second": round(seed_stats["rows_per_second"]), "method": seed_stats["method"],
+                          "peak_memory_mb": _peak_memory_mb()}
+
+        _, rollup_seconds = _timed(refresh_rollups)
+        _, recommendation_seconds = _timed(lambda: refresh_recommendations(full=True))
+        result["derived"] = {"rollups_seconds": round(rollup_seconds, 3),
+                             "recommendations_seconds": round(recommendation_seconds, 3),
+                             "peak_memory_mb": _peak_memory_mb()}
+
+    client = app.test_client()
+
+    # Ingest: de twee uren na de seed als NDJSON via het endpoint
+    ingest_lines = [
+        json.dumps({"lighting_unit_id": unit_id, "timestamp": (end_time + timedelta(hours=hour)).isoformat(),
+                    "consumption_kwh": 0.02, "status": "Normal"})
+        for hour in (1, 2) for unit_id in range(1, scale["units"] + 1)
+    ]
+    response, ingest_seconds = _timed(lambda: client.post('/energy/ingest', data='\n'.join(ingest_lines),
+                                                          content_type='application/x-ndjson'))
+    accepted = response.get_json()["accepted"]
+    result["ingest"] = {"rows": accepted, "seconds": round(ingest_seconds, 3),
+                        "rows_per_second": round(accepted / ingest_seconds) if ingest_seconds else None,
+                        "peak_memory_mb": _peak_memory_mb()}
+
+    scenario_body = {"area_id": 1, "period": "week", "scenarios": [
+        {"name": "dim", "dimming": [{"percent": 30, "start_hour": 0, "end_hour": 6}]},
+        {"name": "led", "led_retrofit": {"unit_type": "Hogedruk Natrium", "power_watt": 50}},
+    ]}
+    # Stadsbrede batch van 24 scenario's: de grootste matmul die het endpoint in één request doet
+    city_scenario_body = {"city_id": 1, "period": "month", "scenarios": [
+        {"name": f"dim {percent}% {start_hour}-6", "dimming": [{"percent": percent, "start_hour": start_hour, "end_hour": 6}],
+         "led_retrofit": {"power_watt": 50}}
+        for percent in (10, 20, 30, 40, 50, 60) for start_hour in (0, 1, 22, 23)
+    ]}
+    routes = {
+        "GET /cities/": ('GET', '/cities/', {}),
+        "GET /cities/<id>/area": ('GET', '/cities/1/area', {}),
+        "GET /energy/data?period=day": ('GET', '/energy/data/1?period=day', {}),
+        "GET /energy/data?period=week": ('GET', '/energy/data/1?period=week', {}),
+        "GET /energy/data?period=month": ('GET', '/energy/data/1?period=month', {}),
+        "GET /energy/savings_scenario": ('GET', '/energy/savings_scenario/1?period=week', {}),
+        "GET /energy/recommendation": ('GET', '/energy/recommendation/1', {}),
+        "GET /energy/data/batch?city": ('GET', '/energy/data/batch?city_id=1&period=week', {}),
+        "POST /energy/scenarios": ('POST', '/energy/scenarios', {"json": scenario_body}),
+        "POST /energy/scenarios?city": ('POST', '/energy/scenarios', {"json": city_scenario_body}),
+        "GET /energy/export?area": ('GET', '/energy/export?area_ids=1&format=csv', {}),
+    }
+    result["routes"] = {label: _measure_route(client, method, url, repetitions, **kwargs)
+                        for label, (method, url, kwargs) in routes.items()}
+    result["peak_memory_mb"] = _peak_memory_mb()
+    return result
+
+def _run_scale_in_process(name, repetitions, state_dir):
+    # Draait in een vers (spawn) proces; de omgeving (DATABASE_URL e.d.) is van de parent geërfd.
+    # Detector snapshot en columnar store per schaal in de tijdelijke map, nooit in backend/data
+    os.environ['ANOMALY_STATE_PATH'] = os.path.join(state_dir, name, 'anomaly_state.npz')
+    os.environ['COLUMNAR_STORE_PATH'] = os.path.join(state_dir, name, 'columnar')
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    return run_scale(create_app(), name, SCALES[name], repetitions)
+
+def run(args):
+    temp_dir = tempfile.mkdtemp(prefix='sue_bench_')
+    try:
+        _run(args, temp_dir)
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+def _run(args, temp_dir):
+    database_url = args.database_url or f"sqlite:///{os.path.join(temp_dir, 'bench.db')}"
+
+    # De app leest zijn config bij import; de schalen draaien in subprocessen die deze omgeving erven
+    os.environ['DATABASE_URL'] = database_url
+    os.environ['ENERGY_CACHE_BACKEND'] = 'none'  # ongecachte latency meten
+    os.environ.setdefault('SLOW_QUERY_THRESHOLD_MS', '5000')  # bulk statements bij het seeden niet allemaal loggen
+    from sqlalchemy.engine import make_url
+
+    scale_names = [name.strip() for name in args.scales.split(',') if name.strip()]
+    unknown = [name for name in scale_names if name not in SCALES]
+    if unknown:
+        raise SystemExit(f"Unknown scales: {', '.join(unknown)} (available: {', '.join(SCALES)})")
+
+    dialect = make_url(database_url).get_backend_name()
+    results = {
+        "commit": _git_commit(),
+        "created_at": datetime.now().isoformat(timespec='seconds'),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": dialect,
+        "repetitions": args.repetitions,
+        "scales": {},
+    }
+    for name in scale_names:
+        print(f"Running benchmark scale {name}...", flush=True)
+        # Eén proces per schaal, zodat peak_memory_mb niet de piek van een eerdere (grotere) schaal meeneemt
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results["scales"][name] = executor.submit(_run_scale_in_process, name, args.repetitions, temp_dir).result()
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{results['created_at'].replace(':', '')}_{results['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as output_file:
+        json.dump(results, output_file, indent=2)
+    print(f"Benchmark results written to {output}")
+
+def compare(args):
+    with open(args.baseline) as baseline_file, open(args.candidate) as candidate_file:
+        baseline, candidate = json.load(baseline_file), json.load(candidate_file)
+    print(f"Baseline {baseline['commit']} vs candidate {candidate['commit']} (threshold {args.threshold:.0%})")
+    regressions = 0
+    for scale, candidate_scale in candidate["scales"].items():
+        baseline_scale = baseline["scales"].get(scale)
+        if not baseline_scale:
+            continue
+        checks = [(f"{scale} seed rows/s", baseline_scale["seed"]["rows_per_second"], candidate_scale["seed"]["rows_per_second"], True),
+                  (f"{scale} ingest rows/s", baseline_scale["ingest"]["rows_per_second"], candidate_scale["ingest"]["rows_per_second"], True),
+                  (f"{scale} peak memory MB", baseline_scale["peak_memory_mb"], candidate_scale["peak_memory_mb"], False)]
+        for route, stats in candidate_scale["routes"].items():
+            if route in baseline_scale["routes"]:
+                checks.append((f"{scale} {route} p95 ms", baseline_scale["routes"][route]["p95_ms"], stats["p95_ms"], False))
+        for label, old, new, higher_is_better in checks:
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            regressed = change < -args.threshold if higher_is_better else change > args.threshold
+            regressions += regressed
+            print(f"{'REGRESSION ' if regressed else ''}{label}: {old} -> {new} ({change:+.1%})")
+    if regressions:
+        raise SystemExit(f"{regressions} regressions above threshold")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = subparsers.add_parser('run', help="Draai de benchmarks en schrijf JSON resultaten.")
+    run_parser.add_argument('--scales', default='10x40d,1kx40d', help=f"Komma-gescheiden uit: {', '.join(SCALES)}")
+    run_parser.add_argument('--database-url', default=None, help="Standaard een tijdelijke SQLite database.")
+    run_parser.add_argument('--repetitions', type=int, default=20)
+    run_parser.add_argument('--output', default=None)
+    run_parser.set_defaults(handler=run)
+
+    compare_parser = subparsers.add_parser('compare', help="Vergelijk twee resultaatbestanden.")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.add_argument('--threshold', type=float, default=0.10)
+    compare_parser.set_defaults(handler=compare)
+
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == '__main__':
+    main()
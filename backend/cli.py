@@ -0,0 +1,118 @@
+# backend/cli.py
+
+import sys
+import click
+import numpy as np
+from services.rollup_service import refresh_rollups, check_rollup_consistency
+from services.export_service import iter_consumption_partitions, iter_export_chunks, EXPORT_FORMATS
+from services.columnar_store import get_columnar_store
+from services.recommendation_engine import refresh_recommendations
+from services.scheduler import run_catch_up_cycle, catch_up_lag_hours
+from database import db
+from services.anomaly_detector import get_anomaly_detector
+from services.retention_service import apply_retention, compacted_through
+from seed_data import seed_initial_data
+from models import STATUS_CODES
+
+def register_commands(app):
+    @app.cli.command('seed')
+    @click.option('--reset', is_flag=True, default=False, help="Wis alle verbruiksdata en genereer SEED_DAYS opnieuw.")
+    def seed_command(reset):
+        """Maak ontbrekende tabellen aan en vul de demo data (steden, gebieden, lichtpunten en verbruik)."""
+        db.create_all()  # Geen migraties hier, alleen aanmaken
+        click.echo("Database tables checked/created.")
+        seed_initial_data(reset=reset)
+        click.echo("Demo data seeding complete.")
+
+    @app.cli.command('catch-up')
+    def catch_up_command():
+        """Vul de verbruiksdata eenmalig aan tot het huidige uur (zoals de achtergrond scheduler)."""
+        result = run_catch_up_cycle()
+        click.echo(f"Appended {result['rows']} rows; rollups refreshed for {result['areas']} areas, "
+                   f"{result['recommendations']} recommendations written; compacted {result['compacted_days']} days "
+                   f"({result['deleted_rows']} raw rows, {result['deleted_events']} anomaly events deleted). Lag: {catch_up_lag_hours()} hours.")
+
+    @app.cli.command('refresh-rollups')
+    def refresh_rollups_command():
+        """Werk de uur/dag rollups bij vanaf de watermark."""
+        touched_areas = refresh_rollups()
+        click.echo(f"Rollups refreshed for {len(touched_areas)} areas.")
+
+    @app.cli.command('check-rollups')
+    @click.option('--area-id', type=int, default=None)
+    @click.option('--start', type=click.DateTime(), default=None)
+    @click.option('--end', type=click.DateTime(), default=None)
+    def check_rollups_command(area_id, start, end):
+        """Vergelijk de uurrollups met de ruwe energy_consumption_data tabel."""
+        mismatches = check_rollup_consistency(area_id, start, end)
+        for mismatch in mismatches[:50]:
+            click.echo(mismatch)
+        if mismatches:
+            raise click.ClickException(f"{len(mismatches)} rollup buckets differ from the raw data.")
+        click.echo("Rollups are consistent with the raw data.")
+
+    @app.cli.command('export-data')
+    @click.option('--area-id', 'area_ids', type=int, multiple=True, help="Herhaalbaar; standaard alle gebieden.")
+    @click.option('--city-id', type=int, default=None)
+    @click.option('--start', type=click.DateTime(), default=None)
+    @click.option('--end', type=click.DateTime(), default=None)
+    @click.option('--format', 'data_format', type=click.Choice(EXPORT_FORMATS), default='csv')
+    @click.option('--gzip', 'compress', is_flag=True, default=False)
+    @click.option('--output', '-o', type=click.Path(allow_dash=True), default='-')
+    def export_data_command(area_ids, city_id, start, end, data_format, compress, output):
+        """Exporteer ruwe uurdata als CSV/NDJSON naar een bestand of stdout."""
+        partitions = iter_consumption_partitions(area_ids or None, city_id, start, end)
+        target = sys.stdout.buffer if output == '-' else open(output, 'wb')
+        try:
+            for chunk in iter_export_chunks(partitions, data_format, compress):
+                target.write(chunk)
+        finally:
+            if target is not sys.stdout.buffer:
+                target.close()
+
+    @app.cli.command('build-columnar-store')
+    @click.option('--reset', is_flag=True, default=False, help="Wis de bestaande store eerst.")
+    def build_columnar_store_command(reset):
+        """Vul de columnar store vanuit energy_consumption_data (ENERGY_STORAGE_ENGINE=columnar)."""
+        store = get_columnar_store()
+        if store is None:
+            raise click.ClickException("Set ENERGY_STORAGE_ENGINE=columnar to use the columnar store.")
+        if reset:
+            store.reset()
+        written = 0
+        for partition in iter_consumption_partitions(chunk_size=100000):
+            unit_ids, _, timestamps, consumption, statuses = zip(*partition)
+            written += store.write(unit_ids, np.array(timestamps, dtype='datetime64[s]'), consumption,
+                                   [STATUS_CODES.get(status, STATUS_CODES['Normal']) for status in statuses])
+        click.echo(f"Wrote {written} readings to the columnar store at {store.path}.")
+
+    @app.cli.command('generate-recommendations')
+    @click.option('--full', is_flag=True, default=False, help="Alle gebieden, niet alleen die met nieuwe data.")
+    def generate_recommendations_command(full):
+        """Bereken aanbevelingen in bulk uit het werkelijke verbruik."""
+        written = refresh_recommendations(full=full)
+        click.echo(f"{written} recommendations written.")
+
+    @app.cli.command('train-anomaly-detector')
+    @click.option('--reset', is_flag=True, default=False, help="Begin met lege statistieken.")
+    def train_anomaly_detector_command(reset):
+        """Bouw de statistieken van de anomaliedetector op uit de historie en sla een snapshot op."""
+        detector = get_anomaly_detector()
+        if detector is None:
+            raise click.ClickException("Anomaly detection is disabled (ANOMALY_DETECTION_ENABLED=0).")
+        if reset:
+            detector.reset()
+        learned = 0
+        for partition in iter_consumption_partitions(chunk_size=100000):
+            unit_ids, _, timestamps, consumption, _ = zip(*partition)
+            detector.process(unit_ids, np.array(timestamps, dtype='datetime64[s]'), consumption, detect=False)
+            learned += len(unit_ids)
+        detector.snapshot()
+        click.echo(f"Learned {learned} readings; snapshot written to {detector.state_path}.")
+
+    @app.cli.command('apply-retention')
+    def apply_retention_command():
+        """Compacteer ruwe uurdata ouder dan RAW_RETENTION_DAYS tot dagtotalen en verwijder de ruwe rijen."""
+        result = apply_retention()
+        click.echo(f"Compacted {result['compacted_days']} days, deleted {result['deleted_rows']} raw rows and {result['deleted_events']} anomaly events. "
+                   f"Raw data starts at {compacted_through() or 'the first reading'}.")
@@ -1,6 +1,63 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import current_app, has_request_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
 
-db = SQLAlchemy()
+REPLICA_BIND = 'replica'
+_use_replica = ContextVar('use_replica', default=False)
+
+class RoutingSession(Session):
+    """Stuurt SELECTs binnen read_replica() naar de replica bind; schrijfacties en flushes blijven op de primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _use_replica.get() and getattr(clause, 'is_select', False):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+@event.listens_for(db.session, 'after_begin')
+def _request_statement_timeout(session, transaction, connection):
+    # Alleen binnen een HTTP request; batch jobs (seed, export, compactie, aanbevelingen, scheduler) hebben geen limiet.
+    # SET LOCAL geldt tot het einde van de transactie, dus de connectie gaat schoon terug naar de pool.
+    if not has_request_context() or connection.dialect.name != 'postgresql':
+        return
+    timeout_ms = current_app.config.get('DATABASE_STATEMENT_TIMEOUT_MS')
+    if timeout_ms:
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+
+@contextmanager
+def read_replica():
+    """Voert de leesqueries in dit blok uit op de replica (als DATABASE_REPLICA_URL is ingesteld)."""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+def engine_options(database_uri, config):
+    # Pool instellingen gelden niet voor SQLite (geen server, eigen pool per bestand)
+    backend = make_url(database_uri).get_backend_name()
+    if backend == 'sqlite':
+        return {}
+    options = {
+        "pool_size": config['DATABASE_POOL_SIZE'],
+        "max_overflow": config['DATABASE_MAX_OVERFLOW'],
+        "pool_timeout": config['DATABASE_POOL_TIMEOUT'],
+        "pool_recycle": config['DATABASE_POOL_RECYCLE'],
+        "pool_pre_ping": config['DATABASE_POOL_PRE_PING'],
+    }
+    return options
 
 def init_db(app):
-    db.init_app(app)
\ No newline at end of file
+    config = app.config
+    config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(config['SQLALCHEMY_DATABASE_URI'], config))
+    replica_url = config.get('DATABASE_REPLICA_URL')
+    if replica_url and REPLICA_BIND not in config.setdefault('SQLALCHEMY_BINDS', {}):
+        config['SQLALCHEMY_BINDS'][REPLICA_BIND] = {"url": replica_url, **engine_options(replica_url, config)}
+    db.init_app(app)
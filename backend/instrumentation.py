@@ -0,0 +1,154 @@
+# backend/instrumentation.py
+
+import logging
+import threading
+import time
+from flask import g, request, has_request_context, Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from database import db
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+slow_query_logger = logging.getLogger('smart_urban_energy.slow_query')
+
+class Histogram:
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.setdefault(labels, {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0})
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels)
+                prefix = label_text + ',' if label_text else ''
+                for bound, count in zip(self.buckets, series["counts"]):
+                    lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {count}')
+                lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {series["count"]}')
+                lines.append(f'{self.name}_sum{{{label_text}}} {series["sum"]}')
+                lines.append(f'{self.name}_count{{{label_text}}} {series["count"]}')
+        return lines
+
+class Metrics:
+    def __init__(self):
+        self.request_latency = Histogram('http_request_duration_seconds', 'Latency per route.', LATENCY_BUCKETS)
+        self.sql_statements = Histogram('http_request_sql_statements', 'SQL statements issued per request.', STATEMENT_BUCKETS)
+        self.sql_time = Histogram('http_request_sql_duration_seconds', 'Time spent in SQL per request.', LATENCY_BUCKETS)
+        self.background_sql_statements = 0
+        self.slow_queries = 0
+        # Extra gauges (naam -> callable die een waarde of een lijst (labels, waarde) teruggeeft)
+        self.gauges = {}
+
+    def render(self):
+        lines = []
+        for histogram in (self.request_latency, self.sql_statements, self.sql_time):
+            lines.extend(histogram.render())
+        lines += ["# TYPE sql_statements_outside_request_total counter",
+                  f"sql_statements_outside_request_total {self.background_sql_statements}",
+                  "# TYPE sql_slow_queries_total counter",
+                  f"sql_slow_queries_total {self.slow_queries}"]
+        for name, collect in sorted(self.gauges.items()):
+            value = collect()
+            lines.append(f"# TYPE {name} gauge")
+            if isinstance(value, list):
+                for labels, sample in value:
+                    label_text = ','.join(f'{key}="{label}"' for key, label in labels)
+                    lines.append(f"{name}{{{label_text}}} {sample}")
+            elif value is not None:
+                lines.append(f"{name} {value}")
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+_engine_listeners_installed = False
+
+def _route_label():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+def _install_engine_listeners(slow_query_threshold):
+    global _engine_listeners_installed
+    if _engine_listeners_installed:
+        return
+    _engine_listeners_installed = True
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration = time.perf_counter() - conn.info['query_start_time'].pop()
+        route = None
+        if has_request_context() and hasattr(g, 'sql_statement_count'):
+            g.sql_statement_count += 1
+            g.sql_time += duration
+            route = _route_label()
+        else:
+            metrics.background_sql_statements += 1
+        if duration * 1000 >= slow_query_threshold():
+            metrics.slow_queries += 1
+            slow_query_logger.warning(
+                "Slow query (%.1f ms) on route %s: %s | params: %.500s",
+                duration * 1000, route or '<background>', ' '.join(statement.split()), parameters
+            )
+
+def _pool_gauge(engines, method):
+    # QueuePool statistieken per bind; pools zonder deze methodes (bv. SQLite :memory:) worden overgeslagen
+    def collect():
+        return [((("bind", bind_key or 'primary'),), getattr(engine.pool, method)())
+                for bind_key, engine in sorted(engines.items(), key=lambda item: item[0] or '')
+                if hasattr(engine.pool, method)]
+    return collect
+
+def init_instrumentation(app):
+    """Registreert request/SQL hooks en het /metrics endpoint (Prometheus tekstformaat)."""
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    _install_engine_listeners(lambda: app.config.get('SLOW_QUERY_THRESHOLD_MS', 200))
+
+    log_file = app.config.get('SLOW_QUERY_LOG_FILE')
+    if log_file and not slow_query_logger.handlers:
+        handler = logging.FileHandler(log_file)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_logger.addHandler(handler)
+
+    with app.app_context():
+        engines = dict(db.engines)
+    metrics.gauges.update({
+        'db_pool_size': _pool_gauge(engines, 'size'),
+        'db_pool_checked_out_connections': _pool_gauge(engines, 'checkedout'),
+        'db_pool_checked_in_connections': _pool_gauge(engines, 'checkedin'),
+        'db_pool_overflow': _pool_gauge(engines, 'overflow'),
+    })
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_start_time = time.perf_counter()
+        g.sql_statement_count = 0
+        g.sql_time = 0.0
+
+    @app.teardown_request
+    def record_request_metrics(exception=None):
+        if not hasattr(g, 'request_start_time'):
+            return
+        labels = (("method", request.method), ("route", _route_label()))
+        metrics.request_latency.observe(labels, time.perf_counter() - g.request_start_time)
+        metrics.sql_statements.observe(labels, g.sql_statement_count)
+        metrics.sql_time.observe(labels, g.sql_time)
+
+    @app.route('/metrics')
+    def metrics_route():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
@@ -15,19 +15,19 @@ class City(db.Model):
 class Area(db.Model):
     __tablename__ = 'areas'
     id = db.Column(db.Integer, primary_key=True)
-    city_id = db.Column(db.Integer, db.ForeignKey('cities.id'), nullable=False)
+    city_id = db.Column(db.Integer, db.ForeignKey('cities.id'), nullable=False, index=True)
     name = db.Column(db.String(100), unique=True, nullable=False) 
     description = db.Column(db.Text)
     
     lighting_units = db.relationship('LightingUnit', backref='area', lazy=True, cascade='all, delete-orphan')
 
     def __repr__(self):
-        return f"<Area {self.name} in City {self.city.name}>"
+        return f"<Area {self.name} in CityID:{self.city_id}>"
 
 class LightingUnit(db.Model):
     __tablename__ = 'lighting_units'
     id = db.Column(db.Integer, primary_key=True)
-    area_id = db.Column(db.Integer, db.ForeignKey('areas.id'), nullable=False)
+    area_id = db.Column(db.Integer, db.ForeignKey('areas.id'), nullable=False, index=True)
     unit_type = db.Column(db.String(50))
     location = db.Column(db.String(255))
     power_watt = db.Column(db.Integer)
@@ -36,15 +36,23 @@ class LightingUnit(db.Model):
     recommendations = db.relationship('Recommendation', backref='lighting_unit', lazy=True, cascade='all, delete-orphan')
 
     def __repr__(self):
-        return f"<LightingUnit {self.location} in Area {self.area.name}>"
+        return f"<LightingUnit {self.location} in AreaID:{self.area_id}>"
+
+# Vaste codering van status_recording voor de bulk/array paden (index = code)
+STATUS_LABELS = ('Normal', 'Daylight_Inefficiency', 'Daylight_Off')
+STATUS_CODES = {label: code for code, label in enumerate(STATUS_LABELS)}
 
 class EnergyConsumptionData(db.Model):
     __tablename__ = 'energy_consumption_data'
+    # Eén meting per lichtpunt per tijdstip; basis voor upserts vanuit de ingest
+    __table_args__ = (db.UniqueConstraint('lighting_unit_id', 'timestamp', name='uq_consumption_unit_timestamp'),)
     id = db.Column(db.Integer, primary_key=True)
     lighting_unit_id = db.Column(db.Integer, db.ForeignKey('lighting_units.id'), nullable=False)
-    timestamp = db.Column(db.DateTime, nullable=False)
+    timestamp = db.Column(db.DateTime, nullable=False, index=True)
     consumption_kwh = db.Column(db.Float, nullable=False)
     status_recording = db.Column(db.String(50))
+    # Moment van (laatste) schrijven; watermark voor de rollup catch-up
+    ingested_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
 
     def __repr__(self):
         return f"<Consumption {self.consumption_kwh}kWh at {self.timestamp} for LU_ID:{self.lighting_unit_id}>"
@@ -52,14 +60,86 @@ class EnergyConsumptionData(db.Model):
 class Recommendation(db.Model):
     __tablename__ = 'recommendations'
     id = db.Column(db.Integer, primary_key=True)
-    area_id = db.Column(db.Integer, db.ForeignKey('areas.id'), nullable=True) 
-    lighting_unit_id = db.Column(db.Integer, db.ForeignKey('lighting_units.id'), nullable=True) 
+    area_id = db.Column(db.Integer, db.ForeignKey('areas.id'), nullable=True, index=True) 
+    lighting_unit_id = db.Column(db.Integer, db.ForeignKey('lighting_units.id'), nullable=True, index=True) 
     date_generated = db.Column(db.Date, nullable=False)
     title = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=False)
     potential_savings_kwh = db.Column(db.Float)
     potential_savings_euro = db.Column(db.Float)
+    percentage_savings = db.Column(db.Float)
     action_status = db.Column(db.String(50))
 
     def __repr__(self):
-        return f"<Recommendation {self.title} for AreaID:{self.area_id} LU_ID:{self.lighting_unit_id}>"
\ No newline at end of file
+        return f"<Recommendation {self.title} for AreaID:{self.area_id} LU_ID:{self.lighting_unit_id}>"
+
+class AreaHourlyConsumption(db.Model):
+    __tablename__ = 'area_hourly_consumption'
+    area_id = db.Column(db.Integer, db.ForeignKey('areas.id'), primary_key=True)
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    total_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    inefficient_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+
+    def __repr__(self):
+        return f"<AreaHourlyConsumption AreaID:{self.area_id} {self.bucket_start} {self.total_kwh}kWh>"
+
+class AreaDailyConsumption(db.Model):
+    __tablename__ = 'area_daily_consumption'
+    area_id = db.Column(db.Integer, db.ForeignKey('areas.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    total_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    inefficient_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+
+    def __repr__(self):
+        return f"<AreaDailyConsumption AreaID:{self.area_id} {self.day} {self.total_kwh}kWh>"
+
+class DailyUnitConsumption(db.Model):
+    __tablename__ = 'daily_unit_consumption'
+    # Gecompacteerde ruwe data: één rij per lichtpunt per dag voor de periode buiten RAW_RETENTION_DAYS
+    lighting_unit_id = db.Column(db.Integer, db.ForeignKey('lighting_units.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    area_id = db.Column(db.Integer, db.ForeignKey('areas.id'), nullable=False, index=True)
+    total_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    inefficient_kwh = db.Column(db.Float, nullable=False, default=0.0)
+    hours_on = db.Column(db.Integer, nullable=False, default=0)
+    readings = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<DailyUnitConsumption LU_ID:{self.lighting_unit_id} {self.day} {self.total_kwh}kWh>"
+
+class CacheGeneration(db.Model):
+    __tablename__ = 'cache_generations'
+    # Teller per gebied die bij nieuwe data omhoog gaat; gedeeld door alle workers en de CLI (response cache keys)
+    area_id = db.Column(db.Integer, primary_key=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<CacheGeneration AreaID:{self.area_id} g{self.generation}>"
+
+class ProcessingWatermark(db.Model):
+    __tablename__ = 'processing_watermarks'
+    name = db.Column(db.String(100), primary_key=True)
+    last_timestamp = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<ProcessingWatermark {self.name} ts:{self.last_timestamp}>"
+
+class AnomalyEvent(db.Model):
+    __tablename__ = 'anomaly_events'
+    # Afwijkende metingen volgens de streaming detector (services/anomaly_detector.py)
+    __table_args__ = (db.Index('ix_anomaly_events_area_timestamp', 'area_id', 'timestamp'),)
+    id = db.Column(db.Integer, primary_key=True)
+    area_id = db.Column(db.Integer, db.ForeignKey('areas.id'), nullable=False)
+    lighting_unit_id = db.Column(db.Integer, db.ForeignKey('lighting_units.id'), nullable=False, index=True)
+    timestamp = db.Column(db.DateTime, nullable=False, index=True)
+    rule = db.Column(db.String(50), nullable=False)
+    consumption_kwh = db.Column(db.Float, nullable=False)
+    expected_kwh = db.Column(db.Float)
+    score = db.Column(db.Float)
+    detected_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    def __repr__(self):
+        return f"<AnomalyEvent {self.rule} at {self.timestamp} for LU_ID:{self.lighting_unit_id}>"
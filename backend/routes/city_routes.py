@@ -6,12 +6,13 @@ city_bp = Blueprint('city_bp', __name__, url_prefix='/cities')
 
 @city_bp.route('/')
 def get_cities():
-    cities = City.query.all()
+    # Alleen de benodigde kolommen; voor grote inventarissen zie de gepagineerde /inventory/cities
+    cities = db.session.query(City.id, City.name).order_by(City.id).all()
     return jsonify([{"id": city.id, "name": city.name} for city in cities])
 
 @city_bp.route('/<int:city_id>/area') # Specifieker dan /city_area
 def get_area_for_city(city_id):
-    area = Area.query.filter_by(city_id=city_id).first()
+    area = db.session.query(Area.id, Area.name, Area.description).filter_by(city_id=city_id).order_by(Area.id).first()
     if not area:
         return jsonify({"error": "Area not found for this city"}), 404
     return jsonify({"id": area.id, "name": area.name, "description": area.description})
\ No newline at end of file
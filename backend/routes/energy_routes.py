@@ -1,29 +1,202 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context
 from database import db
 from models import Area
-from services.energy_service import get_aggregated_energy_data, get_area_recommendation, get_simulated_savings_scenario
+from services.energy_service import (get_aggregated_energy_data, get_area_recommendation, get_simulated_savings_scenario,
+                                     get_batch_aggregated_energy_data, get_area_anomalies)
+from services.cache import cached_area_call
+from services.aggregation import resolve_time_range, parse_timestamp
+from services.ingest_service import ingest_readings
+from services.scenario_service import simulate_scenarios
+from services.scheduler import catch_up_lag_hours, get_scheduler
+from services.anomaly_detector import RULES as ANOMALY_RULES
+from services.export_service import iter_consumption_partitions, iter_export_chunks, EXPORT_FORMATS
 
 energy_bp = Blueprint('energy_bp', __name__, url_prefix='/energy')
 
+def _cached_json_response(kind, area_id, params, compute):
+    # Serveer uit de cache met ETag/Last-Modified; een conditionele GET krijgt een 304 zonder body
+    entry, error = cached_area_call(kind, area_id, params, compute)
+    if error:
+        return jsonify({"error": error}), 404
+    response = current_app.response_class(entry['body'], mimetype='application/json')
+    response.set_etag(entry['etag'])
+    response.last_modified = entry['last_modified']
+    return response.make_conditional(request)
+
+def _time_arg(name):
+    # Met offset of 'Z' omgerekend naar lokale tijd, zodat vergelijken met naive datetimes geen TypeError geeft
+    value = request.args.get(name)
+    return parse_timestamp(value) if value else None
+
 @energy_bp.route('/data/<int:area_id>')
 def energy_data_route(area_id):
+    # ?period=day|week|month, of een expliciete ?start=&end=&resolution=15min|hour|day|week|month; ?max_points= downsamplet
     period_str = request.args.get('period', 'week')
-    data, error = get_aggregated_energy_data(area_id, period_str)
+    resolution = request.args.get('resolution')
+    try:
+        start_time = _time_arg('start')
+        end_time = _time_arg('end')
+        max_points = int(request.args['max_points']) if request.args.get('max_points') else None
+        if start_time or end_time or resolution:
+            resolve_time_range(period_str, start_time, end_time, resolution)
+        if max_points is not None and max_points < 3:
+            raise ValueError("max_points must be at least 3")
+    except ValueError as exc:
+        return jsonify({"error": f"Invalid range request: {exc}"}), 400
+
+    params = '|'.join(str(value) for value in (period_str, request.args.get('start'), request.args.get('end'),
+                                                resolution, max_points))
+    return _cached_json_response('data', area_id, params,
+                                 lambda: get_aggregated_energy_data(area_id, period_str, start_time, end_time,
+                                                                    resolution, max_points))
+
+def _parse_area_ids(area_ids):
+    # None of 'all' betekent geen filter; anders een komma-gescheiden string of een lijst van ids
+    if area_ids is None or area_ids == 'all':
+        return None
+    if isinstance(area_ids, str):
+        return [int(area_id) for area_id in area_ids.split(',') if area_id.strip()]
+    return [int(area_id) for area_id in area_ids]
+
+def _json_object():
+    # Een ontbrekende of ongeldige body telt als {}; een geldige JSON body die geen object is geeft None (400)
+    payload = request.get_json(silent=True)
+    if payload is None:
+        return {}
+    return payload if isinstance(payload, dict) else None
+
+def _parse_city_id(city_id):
+    if city_id is None:
+        return None
+    if isinstance(city_id, bool) or not isinstance(city_id, (int, str)):
+        raise ValueError("city_id must be an integer")
+    try:
+        return int(city_id)
+    except ValueError:
+        raise ValueError("city_id must be an integer") from None
+
+def _parse_period(period_str):
+    if not isinstance(period_str, str):
+        raise ValueError("period must be a string")
+    return period_str
+
+@energy_bp.route('/data/batch', methods=['GET', 'POST'])
+def batch_energy_data_route():
+    # Area ids via ?area_ids=1,2,3 of een JSON body {"area_ids": [...]}; 'all' of city_id zijn ook mogelijk
+    payload = _json_object()
+    if payload is None:
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    area_ids = payload.get('area_ids', request.args.get('area_ids'))
+    try:
+        city_id = _parse_city_id(payload.get('city_id', request.args.get('city_id')))
+        period_str = _parse_period(payload.get('period', request.args.get('period', 'week')))
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+
+    if area_ids is None and city_id is None:
+        return jsonify({"error": "Provide area_ids, city_id or area_ids=all"}), 400
+    try:
+        area_ids = _parse_area_ids(area_ids)
+    except (TypeError, ValueError):
+        return jsonify({"error": "area_ids must be a list of integers"}), 400
+
+    data, error = get_batch_aggregated_energy_data(area_ids, city_id, period_str)
     if error:
         return jsonify({"error": error}), 404
     return jsonify(data)
 
 @energy_bp.route('/recommendation/<int:area_id>')
 def recommendation_route(area_id):
-    rec_data, error = get_area_recommendation(area_id)
-    if error:
-        return jsonify({"error": error}), 404
-    return jsonify(rec_data)
+    return _cached_json_response('recommendation', area_id, '',
+                                 lambda: get_area_recommendation(area_id))
 
 @energy_bp.route('/savings_scenario/<int:area_id>')
 def savings_scenario_route(area_id):
     period_str = request.args.get('period', 'week')
-    savings_data, error = get_simulated_savings_scenario(area_id, period_str)
+    return _cached_json_response('savings_scenario', area_id, period_str,
+                                 lambda: get_simulated_savings_scenario(area_id, period_str))
+
+@energy_bp.route('/anomalies/<int:area_id>')
+def anomalies_route(area_id):
+    # ?start=&end= (ISO 8601), ?rule=over_power|daylight_burning|dark_at_night|z_score, ?limit= (max 1000)
+    rule = request.args.get('rule')
+    limit = request.args.get('limit', 100, type=int)
+    try:
+        start_time = _time_arg('start')
+        end_time = _time_arg('end')
+    except ValueError:
+        return jsonify({"error": "Invalid start or end"}), 400
+    if rule is not None and rule not in ANOMALY_RULES:
+        return jsonify({"error": f"rule must be one of {', '.join(ANOMALY_RULES)}"}), 400
+    if not 1 <= limit <= 1000:
+        return jsonify({"error": "limit must be between 1 and 1000"}), 400
+
+    data, error = get_area_anomalies(area_id, start_time, end_time, rule, limit)
+    if error:
+        return jsonify({"error": error}), 404
+    return jsonify(data)
+
+@energy_bp.route('/scenarios', methods=['POST'])
+def scenarios_route():
+    # Body: {"area_ids": [...] of "city_id": n, "period": "week", "scenarios": [{...}, ...]}
+    payload = _json_object()
+    if payload is None:
+        return jsonify({"error": "Request body must be a JSON object"}), 400
+    if payload.get('area_ids') is None and payload.get('area_id') is None and payload.get('city_id') is None:
+        return jsonify({"error": "Provide area_id, area_ids or city_id"}), 400
+    try:
+        area_ids = [int(payload['area_id'])] if payload.get('area_id') is not None else _parse_area_ids(payload.get('area_ids'))
+        city_id = _parse_city_id(payload.get('city_id'))
+        period_str = _parse_period(payload.get('period', 'week'))
+        data, error = simulate_scenarios(payload.get('scenarios') or [], area_ids, city_id, period_str)
+    except (KeyError, TypeError, ValueError) as exc:
+        return jsonify({"error": f"Invalid scenario request: {exc}"}), 400
     if error:
         return jsonify({"error": error}), 404
-    return jsonify(savings_data)
\ No newline at end of file
+    return jsonify(data)
+
+@energy_bp.route('/ingest', methods=['POST'])
+def ingest_route():
+    # Bulk meterstanden als NDJSON (standaard) of CSV; het formaat volgt uit ?format= of de Content-Type
+    data_format = request.args.get('format')
+    if not data_format:
+        data_format = 'csv' if request.mimetype in ('text/csv', 'application/csv') else 'ndjson'
+    if data_format not in ('csv', 'ndjson'):
+        return jsonify({"error": "format must be 'ndjson' or 'csv'"}), 400
+    result = ingest_readings(request.stream, data_format)
+    return jsonify(result)
+
+@energy_bp.route('/export')
+def export_route():
+    # Streamt ruwe uurdata als CSV of NDJSON; geheugengebruik blijft vlak ongeacht de lengte van de periode
+    data_format = request.args.get('format', 'csv')
+    compress = request.args.get('gzip', '0').lower() in ('1', 'true', 'yes')
+    if data_format not in EXPORT_FORMATS:
+        return jsonify({"error": "format must be 'csv' or 'ndjson'"}), 400
+    try:
+        area_ids = _parse_area_ids(request.args.get('area_ids'))
+        start_time = _time_arg('start')
+        end_time = _time_arg('end')
+    except ValueError:
+        return jsonify({"error": "Invalid area_ids, start or end"}), 400
+
+    partitions = iter_consumption_partitions(area_ids, request.args.get('city_id', type=int), start_time, end_time)
+    filename = f"energy_consumption.{data_format}" + ('.gz' if compress else '')
+    mimetype = 'application/gzip' if compress else ('text/csv' if data_format == 'csv' else 'application/x-ndjson')
+    return Response(
+        stream_with_context(iter_export_chunks(partitions, data_format, compress)),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
+
+@energy_bp.route('/freshness')
+def freshness_route():
+    # Hoe ver de verbruiksdata achterloopt op het huidige uur, en de status van de catch-up scheduler
+    scheduler = get_scheduler()
+    return jsonify({
+        "lag_hours": catch_up_lag_hours(),
+        "scheduler_running": bool(scheduler and scheduler.running),
+        "last_run": scheduler.last_run.isoformat(timespec='seconds') if scheduler and scheduler.last_run else None,
+        "last_result": scheduler.last_result if scheduler else None,
+        "last_error": scheduler.last_error if scheduler else None,
+    })
@@ -0,0 +1,55 @@
+from flask import Blueprint, jsonify, request
+from services.inventory_service import list_cities, list_areas, list_lighting_units, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+
+inventory_bp = Blueprint('inventory_bp', __name__, url_prefix='/inventory')
+
+def _page_args():
+    # ?cursor=<next_cursor van de vorige pagina>&limit=n (max MAX_PAGE_SIZE)
+    cursor = request.args.get('cursor', type=int)
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if request.args.get('cursor') and cursor is None:
+        raise ValueError("cursor must be an integer")
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+    return cursor, limit
+
+def _includes():
+    return {include.strip() for include in request.args.get('include', '').split(',') if include.strip()}
+
+def _int_arg(name):
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer")
+
+@inventory_bp.route('/cities')
+def cities_route():
+    # ?include=areas laadt de gebieden van de hele pagina in één extra query
+    try:
+        cursor, limit = _page_args()
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(list_cities(cursor, limit, include_areas='areas' in _includes()))
+
+@inventory_bp.route('/areas')
+def areas_route():
+    try:
+        cursor, limit = _page_args()
+        city_id = _int_arg('city_id')
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(list_areas(city_id, cursor, limit, include_lighting_units='lighting_units' in _includes()))
+
+@inventory_bp.route('/lighting_units')
+def lighting_units_route():
+    # Filters: city_id, area_id, unit_type, power_watt, min_power_watt, max_power_watt; ?include=area
+    try:
+        cursor, limit = _page_args()
+        filters = {name: _int_arg(name) for name in ('city_id', 'area_id', 'power_watt', 'min_power_watt', 'max_power_watt')}
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
+    return jsonify(list_lighting_units(unit_type=request.args.get('unit_type'), cursor=cursor, limit=limit,
+                                       include_area='area' in _includes(), **filters))
@@ -1,14 +1,31 @@
 # backend/seed_data.py
 
 from datetime import datetime, timedelta
-import random
+import numpy as np
+from flask import current_app
 from database import db # Importeer db uit database.py
-from models import City, Area, LightingUnit, EnergyConsumptionData, Recommendation
+from models import City, Area, LightingUnit, EnergyConsumptionData, Recommendation, AnomalyEvent, STATUS_CODES
 from sqlalchemy import func
+from services.bulk_loader import write_consumption_batches
+from services.rollup_service import refresh_rollups, reset_rollups
+from services.columnar_store import get_columnar_store
+from services.recommendation_engine import refresh_recommendations
+from services.scheduler import set_catch_up_watermark
+from services.anomaly_detector import get_anomaly_detector, learn_consumption
+from services.retention_service import reset_retention
 
-# De seed functie hoeft de app niet meer als argument te krijgen, 
-# omdat we deze nu aanroepen binnen app.app_context() in app.py
-def seed_initial_data(): 
+# Vaste opbouw van lichtpunten per gebied; bij een grotere schaal wordt dit patroon herhaald
+UNIT_TEMPLATES = [
+    ('LED', 'Hoofdstraat', 50),
+    ('LED', 'Kerklaan', 50),
+    ('Hogedruk Natrium', 'Marktplein', 100),
+]
+DAYLIGHT_START_HOUR = 7
+DAYLIGHT_END_HOUR = 18
+
+# De seed functie draait via 'flask seed' (zie cli.py) binnen de app context;
+# het aanvullen van nieuwe uren gebeurt daarna door de catch-up scheduler
+def seed_initial_data(reset=False): 
     # --- Controleer en voeg Cities and Areas toe ---
     if not City.query.first():
         print("Adding demo City and Area data...")
@@ -28,20 +45,8 @@ def seed_initial_data():
     else:
         print("City and Area data already exists, skipping demo data insertion.")
 
-    # --- Controleer en voeg LightingUnits toe (indien nog niet aanwezig) ---
-    if not LightingUnit.query.first():
-        print("Adding demo LightingUnits for all areas...")
-        all_areas = Area.query.all()
-        for area in all_areas:
-            lu1 = LightingUnit(area=area, unit_type='LED', location=f'Hoofdstraat {area.name}', power_watt=50)
-            lu2 = LightingUnit(area=area, unit_type='LED', location=f'Kerklaan {area.name}', power_watt=50)
-            lu3 = LightingUnit(area=area, unit_type='Hogedruk Natrium', location=f'Marktplein {area.name}', power_watt=100)
-            db.session.add_all([lu1, lu2, lu3])
-        db.session.commit()
-        print("Demo LightingUnits added.")
-    else:
-        print("LightingUnits already exist.")
-        
+    # --- Controleer en vul LightingUnits aan tot de ingestelde schaal ---
+    _ensure_lighting_units(current_app.config.get('SEED_UNITS_PER_AREA', 3))
 
     # --- Energieverbruiksdata genereren of aanvullen ---
     # We willen data genereren tot het huidige uur (afgerond op uur)
@@ -50,79 +55,119 @@ def seed_initial_data():
     # Bepaal het meest recente tijdstip van bestaande data
     max_existing_timestamp = db.session.query(func.max(EnergyConsumptionData.timestamp)).scalar()
     
-    all_lighting_units_db = LightingUnit.query.all()
-    if not all_lighting_units_db:
+    units = db.session.query(LightingUnit.id, LightingUnit.unit_type, LightingUnit.power_watt).order_by(LightingUnit.id).all()
+    if not units:
         print("No lighting units found, cannot generate consumption data.")
         return
 
-    # Scenario 1: Geen data, of data is veel te oud (meer dan 2 dagen oud)
-    # Volledige hergeneratie van ~40 dagen data tot nu
-    if not max_existing_timestamp or max_existing_timestamp < (generate_until_time - timedelta(days=2)):
-        print("No recent consumption data found or data is too old. Deleting existing consumption data and generating new data for ~40 days up to now...")
+    rng = np.random.default_rng(current_app.config.get('SEED_RANDOM_SEED'))
+
+    # Scenario 1: Geen data, of expliciet een reset (flask seed --reset)
+    # Volledige hergeneratie van SEED_DAYS (standaard ~40) dagen data tot nu
+    if not max_existing_timestamp or reset:
+        seed_days = current_app.config.get('SEED_DAYS', 40)
+        print(f"No consumption data found or reset requested. Deleting existing consumption data and generating new data for ~{seed_days} days up to now...")
+        AnomalyEvent.query.delete()
         EnergyConsumptionData.query.delete() # Verwijder alle oude verbruiksdata
         db.session.commit()
+        reset_rollups() # Rollups en watermark horen bij de gewiste data
+        reset_retention() # Net als de gecompacteerde dagtotalen
+        store = get_columnar_store()
+        if store is not None:
+            store.reset()
+        detector = get_anomaly_detector()
+        if detector is not None:
+            detector.reset()
         
-        start_simulation_time = generate_until_time - timedelta(days=40)
-        
-        for lu in all_lighting_units_db:
-            current_time = start_simulation_time
-            while current_time <= generate_until_time:
-                consumption = 0.0
-                status = 'Normal'
-
-                if (current_time.hour >= 18 or current_time.hour < 7) or lu.unit_type == 'Hogedruk Natrium':
-                    base_consumption = (lu.power_watt / 1000) * random.uniform(0.2, 0.5)
-                    consumption = base_consumption
-                    if lu.unit_type == 'Hogedruk Natrium' and (current_time.hour >= 7 and current_time.hour < 18):
-                        status = 'Daylight_Inefficiency'
-                    elif current_time.hour >= 7 and current_time.hour < 18:
-                        status = 'Daylight_Off'
-                
-                consumption += random.uniform(-consumption * 0.1, consumption * 0.1)
-                if consumption < 0: consumption = 0
-                
-                data_entry = EnergyConsumptionData(
-                    lighting_unit=lu,
-                    timestamp=current_time,
-                    consumption_kwh=consumption,
-                    status_recording=status
-                )
-                db.session.add(data_entry)
-                current_time += timedelta(hours=1)
-        db.session.commit()
+        start_simulation_time = generate_until_time - timedelta(days=seed_days)
+        write_consumption_batches(_learned(generate_consumption_batches(units, start_simulation_time, generate_until_time, rng)))
         print("Demo EnergyConsumptionData generated up to current hour for all lighting units.")
     
     # Scenario 2: Data is aanwezig, maar niet up-to-date tot het huidige uur
     elif max_existing_timestamp < generate_until_time:
         print(f"Existing data ends at {max_existing_timestamp}. Generating supplementary data up to current hour...")
         start_new_data_generation = max_existing_timestamp + timedelta(hours=1)
-        
-        for lu in all_lighting_units_db:
-            current_time = start_new_data_generation
-            while current_time <= generate_until_time:
-                consumption = 0.0
-                status = 'Normal'
-
-                if (current_time.hour >= 18 or current_time.hour < 7) or lu.unit_type == 'Hogedruk Natrium':
-                    base_consumption = (lu.power_watt / 1000) * random.uniform(0.2, 0.5)
-                    consumption = base_consumption
-                    if lu.unit_type == 'Hogedruk Natrium' and (current_time.hour >= 7 and current_time.hour < 18):
-                        status = 'Daylight_Inefficiency'
-                    elif current_time.hour >= 7 and current_time.hour < 18:
-                        status = 'Daylight_Off'
-                
-                consumption += random.uniform(-consumption * 0.1, consumption * 0.1)
-                if consumption < 0: consumption = 0
-                
-                data_entry = EnergyConsumptionData(
-                    lighting_unit=lu,
-                    timestamp=current_time,
-                    consumption_kwh=consumption,
-                    status_recording=status
-                )
-                db.session.add(data_entry)
-                current_time += timedelta(hours=1)
-        db.session.commit()
+        write_consumption_batches(_learned(generate_consumption_batches(units, start_new_data_generation, generate_until_time, rng)))
         print("Supplementary EnergyConsumptionData generated.")
     else:
-        print("EnergyConsumptionData is already up-to-date.")
\ No newline at end of file
+        print("EnergyConsumptionData is already up-to-date.")
+    # Vanaf hier vult de scheduler uur voor uur aan
+    set_catch_up_watermark(generate_until_time)
+    db.session.commit()
+    detector = get_anomaly_detector()
+    if detector is not None:
+        detector.snapshot()
+
+    # Werk de uur/dag rollups bij voor alle nieuwe verbruiksdata
+    touched_areas = refresh_rollups()
+    print(f"Consumption rollups refreshed for {len(touched_areas)} areas.")
+
+    # Herbereken aanbevelingen voor gebieden met nieuwe data
+    written = refresh_recommendations()
+    print(f"Recommendations refreshed ({written} written).")
+
+
+def _learned(batches):
+    # De anomaliedetector leert de gegenereerde data zonder er events voor vast te leggen
+    for batch in batches:
+        learn_consumption(batch['lighting_unit_id'], batch['timestamp'], batch['consumption_kwh'])
+        yield batch
+
+
+def _ensure_lighting_units(units_per_area):
+    counts = dict(
+        db.session.query(LightingUnit.area_id, func.count(LightingUnit.id)).group_by(LightingUnit.area_id).all()
+    )
+    new_units = []
+    for area_id, area_name in db.session.query(Area.id, Area.name).order_by(Area.id).all():
+        for index in range(counts.get(area_id, 0), units_per_area):
+            unit_type, street, power_watt = UNIT_TEMPLATES[index % len(UNIT_TEMPLATES)]
+            location = f'{street} {area_name}' if index < len(UNIT_TEMPLATES) else f'{street} {index + 1} {area_name}'
+            new_units.append({"area_id": area_id, "unit_type": unit_type, "location": location, "power_watt": power_watt})
+
+    if not new_units:
+        print("LightingUnits already exist.")
+        return
+    print(f"Adding {len(new_units)} demo LightingUnits ({units_per_area} per area)...")
+    db.session.execute(LightingUnit.__table__.insert(), new_units)
+    db.session.commit()
+    print("Demo LightingUnits added.")
+
+
+def generate_consumption_batches(units, start_time, end_time, rng, rows_per_batch=500000):
+    """Genereert uurlijkse verbruiksreeksen voor alle units als numpy batches (unit-major).
+
+    `units` is een lijst van (id, unit_type, power_watt). Dezelfde regels als de oorspronkelijke
+    per-rij generator: 's nachts brandt alles, overdag alleen 'Hogedruk Natrium' (Daylight_Inefficiency).
+    """
+    n_hours = int((end_time - start_time) // timedelta(hours=1)) + 1
+    if n_hours <= 0 or not units:
+        return
+
+    timestamps = np.datetime64(start_time, 'h') + np.arange(n_hours)
+    hour_of_day = (start_time.hour + np.arange(n_hours)) % 24
+    daylight = (hour_of_day >= DAYLIGHT_START_HOUR) & (hour_of_day < DAYLIGHT_END_HOUR)
+
+    unit_ids = np.array([unit[0] for unit in units], dtype=np.int64)
+    is_natrium = np.array([unit[1] == 'Hogedruk Natrium' for unit in units])
+    power_kw = np.array([(unit[2] or 0) / 1000 for unit in units], dtype=np.float64)
+
+    units_per_batch = max(1, rows_per_batch // n_hours)
+    for offset in range(0, len(units), units_per_batch):
+        block = slice(offset, offset + units_per_batch)
+        block_size = len(unit_ids[block])
+
+        burning = ~daylight[np.newaxis, :] | is_natrium[block, np.newaxis]
+        consumption = power_kw[block, np.newaxis] * rng.uniform(0.2, 0.5, size=(block_size, n_hours))
+        consumption *= 1 + rng.uniform(-0.1, 0.1, size=(block_size, n_hours))
+        consumption = np.where(burning, np.clip(consumption, 0, None), 0.0)
+
+        status = np.full((block_size, n_hours), STATUS_CODES['Normal'], dtype=np.uint8)
+        status[is_natrium[block, np.newaxis] & daylight[np.newaxis, :]] = STATUS_CODES['Daylight_Inefficiency']
+
+        yield {
+            "lighting_unit_id": np.repeat(unit_ids[block], n_hours),
+            "timestamp": np.tile(timestamps, block_size),
+            "consumption_kwh": consumption.ravel(),
+            "status_code": status.ravel(),
+        }
@@ -0,0 +1,181 @@
+from datetime import datetime, timedelta
+from database import db
+from models import LightingUnit, EnergyConsumptionData, AreaHourlyConsumption, AreaDailyConsumption
+from sqlalchemy import func, case, cast, extract, Integer
+from services.columnar_store import get_columnar_store
+from services.retention_service import compacted_through
+
+INEFFICIENT_STATUS = 'Daylight_Inefficiency'
+
+# period -> (lengte van het venster, bucket resolutie, label formaat)
+PERIODS = {
+    'day': (timedelta(hours=24), 'hour', '%H:00:00'),
+    'week': (timedelta(days=7), 'day', '%Y-%m-%d'),
+    'month': (timedelta(days=30), 'day', '%Y-%m-%d'),
+}
+
+RESOLUTIONS = ('15min', 'hour', 'day', 'week', 'month')
+ISO_LABEL_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+def parse_timestamp(value):
+    """ISO 8601 naar naive lokale tijd; een offset of 'Z' wordt omgerekend (de database bewaart lokale tijd)."""
+    timestamp = datetime.fromisoformat(str(value).strip().replace('Z', '+00:00'))
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
+def resolve_period(period_str, end_time):
+    # Onbekende periodes vallen terug op 'week', zoals voorheen
+    window, resolution, label_format = PERIODS.get(period_str, PERIODS['week'])
+    return end_time - window, resolution, label_format
+
+def resolve_time_range(period_str, start_time=None, end_time=None, resolution=None):
+    """Vult een expliciete start/end/resolutie aan met de defaults van de periode; ValueError bij ongeldige invoer."""
+    end_time = end_time or datetime.now()
+    period_start, period_resolution, _ = resolve_period(period_str, end_time)
+    start_time = start_time or period_start
+    resolution = resolution or period_resolution
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"resolution must be one of {', '.join(RESOLUTIONS)}")
+    if start_time >= end_time:
+        raise ValueError("start must be before end")
+    if resolution == '15min':
+        # Kwartieren komen uit de ruwe tabel; vóór de compactiegrens bestaan alleen nog dagtotalen
+        boundary = compacted_through()
+        if boundary is not None and start_time < boundary:
+            raise ValueError(f"15min resolution is only available from {boundary.isoformat()}")
+    return start_time, end_time, resolution
+
+def bucket_expr(column, resolution):
+    """Trunceert een timestamp kolom tot het begin van zijn bucket, op PostgreSQL en SQLite."""
+    if db.engine.dialect.name == 'sqlite':
+        if resolution == '15min':
+            quarter = cast(func.strftime('%M', column), Integer) / 15 * 15
+            return func.strftime('%Y-%m-%d %H:', column).op('||')(func.printf('%02d:00', quarter))
+        if resolution == 'week':
+            # Weken beginnen op maandag, net als date_trunc('week') op PostgreSQL
+            return func.date(column, 'weekday 0', '-6 days').op('||')(' 00:00:00')
+        fmt = {'hour': '%Y-%m-%d %H:00:00', 'day': '%Y-%m-%d 00:00:00', 'month': '%Y-%m-01 00:00:00'}[resolution]
+        return func.strftime(fmt, column)
+    if resolution == '15min':
+        quarter = cast(func.floor(extract('minute', column) / 15) * 15, Integer)
+        return func.date_trunc('hour', column) + func.make_interval(0, 0, 0, 0, 0, quarter)
+    return func.date_trunc(resolution, column)
+
+def truncate_datetime(moment, resolution):
+    """Python tegenhanger van bucket_expr voor één datetime."""
+    if resolution == '15min':
+        return moment.replace(minute=moment.minute // 15 * 15, second=0, microsecond=0)
+    if resolution == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    day = floor_day(moment)
+    if resolution == 'week':
+        return day - timedelta(days=day.weekday())
+    if resolution == 'month':
+        return day.replace(day=1)
+    return day
+
+def inefficient_kwh_sum(kwh_column=EnergyConsumptionData.consumption_kwh,
+                        status_column=EnergyConsumptionData.status_recording):
+    # Conditionele aggregatie: het inefficiënte deel in dezelfde scan als het totaal
+    return func.sum(case((status_column == INEFFICIENT_STATUS, kwh_column), else_=0.0))
+
+def as_datetime(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value
+    return datetime.combine(value, datetime.min.time())
+
+def floor_day(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+def aggregate_raw(area_ids=None, start_time=None, end_time=None, resolution='hour', end_exclusive=False):
+    """Eén GROUP BY over de ruwe tabel: (area_id, bucket_start, total_kwh, inefficient_kwh) per bucket.
+
+    Alleen het retentievenster bestaat nog als ruwe data; de area rollups bewaren de volledige historie.
+    """
+    bucket = bucket_expr(EnergyConsumptionData.timestamp, resolution).label('bucket_start')
+    query = db.session.query(
+        LightingUnit.area_id,
+        bucket,
+        func.sum(EnergyConsumptionData.consumption_kwh),
+        inefficient_kwh_sum()
+    ).join(LightingUnit)
+    if area_ids is not None:
+        query = query.filter(LightingUnit.area_id.in_(list(area_ids)))
+    if start_time is not None:
+        query = query.filter(EnergyConsumptionData.timestamp >= start_time)
+    if end_time is not None:
+        query = query.filter(EnergyConsumptionData.timestamp < end_time if end_exclusive
+                             else EnergyConsumptionData.timestamp <= end_time)
+    rows = query.group_by(LightingUnit.area_id, 'bucket_start').order_by(LightingUnit.area_id, 'bucket_start').all()
+    return [(area_id, as_datetime(bucket_start), total or 0.0, inefficient or 0.0)
+            for area_id, bucket_start, total, inefficient in rows]
+
+def aggregate_rollups(area_ids, start_time, end_time, resolution):
+    """Leest (area_id, bucket_start, total_kwh, inefficient_kwh) uit de uur- of dagrollups.
+
+    Voor 'day', 'week' en 'month' komen volledige dagen uit de dagrollup en de gedeeltelijke randdagen uit
+    de uurrollup, zodat het resultaat overeenkomt met een filter op de ruwe timestamps.
+    """
+    area_ids = list(area_ids)
+    hourly = AreaHourlyConsumption
+    if resolution == 'hour':
+        rows = db.session.query(hourly.area_id, hourly.bucket_start, hourly.total_kwh, hourly.inefficient_kwh).filter(
+            hourly.area_id.in_(area_ids),
+            hourly.bucket_start >= start_time,
+            hourly.bucket_start <= end_time
+        ).order_by(hourly.area_id, hourly.bucket_start).all()
+        return [tuple(row) for row in rows]
+
+    first_full_day = floor_day(start_time)
+    if first_full_day < start_time:
+        first_full_day += timedelta(days=1)
+    last_partial_day = floor_day(end_time)
+
+    # Dagen worden hier tot week/maand gegroepeerd: hooguit ~365 voorgeaggregeerde rijen per gebied per jaar
+    series = {}
+    def add(area_id, day, total, inefficient):
+        bucket = truncate_datetime(day, resolution)
+        current = series.get((area_id, bucket), (0.0, 0.0))
+        series[(area_id, bucket)] = (current[0] + total, current[1] + inefficient)
+
+    edge_rows = db.session.query(hourly.area_id, hourly.bucket_start, hourly.total_kwh, hourly.inefficient_kwh).filter(
+        hourly.area_id.in_(area_ids),
+        hourly.bucket_start <= end_time,
+        ((hourly.bucket_start >= start_time) & (hourly.bucket_start < first_full_day)) |
+        (hourly.bucket_start >= max(last_partial_day, first_full_day))
+    ).all()
+    for area_id, bucket_start, total, inefficient in edge_rows:
+        add(area_id, floor_day(bucket_start), total, inefficient)
+
+    daily = AreaDailyConsumption
+    full_day_rows = db.session.query(daily.area_id, daily.day, daily.total_kwh, daily.inefficient_kwh).filter(
+        daily.area_id.in_(area_ids),
+        daily.day >= first_full_day.date(),
+        daily.day < last_partial_day.date()
+    ).all()
+    for area_id, day, total, inefficient in full_day_rows:
+        add(area_id, as_datetime(day), total, inefficient)
+
+    return [(area_id, day, total, inefficient) for (area_id, day), (total, inefficient) in sorted(series.items())]
+
+def aggregate_areas(area_ids, start_time, end_time, resolution):
+    """(area_id, bucket_start, total_kwh, inefficient_kwh) uit de columnar store als die actief is, anders uit de rollups.
+
+    Kwartieren zijn fijner dan de rollups en de store; die gaan met date_trunc over de ruwe tabel.
+    """
+    if resolution == '15min':
+        return aggregate_raw(area_ids, start_time, end_time, resolution)
+    store = get_columnar_store()
+    if store is None:
+        return aggregate_rollups(area_ids, start_time, end_time, resolution)
+    unit_area_pairs = db.session.query(LightingUnit.id, LightingUnit.area_id).filter(
+        LightingUnit.area_id.in_(list(area_ids))
+    ).all()
+    return store.aggregate(unit_area_pairs, start_time, end_time, resolution)
+
+def aggregate_area_series(area_id, start_time, end_time, resolution):
+    """(bucket_start, total_kwh, inefficient_kwh) per bucket voor één gebied."""
+    return [row[1:] for row in aggregate_areas([area_id], start_time, end_time, resolution)]
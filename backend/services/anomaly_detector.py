@@ -0,0 +1,238 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import numpy as np
+from flask import current_app
+from database import db
+from models import LightingUnit, AnomalyEvent
+
+try:
+    import fcntl
+except ImportError:  # geen advisory locks (Windows): draai de detector dan in één proces
+    fcntl = None
+
+BURNING_FRACTION = 0.05  # onder 5% van het nominale vermogen geldt een lichtpunt als 'uit'
+STD_FLOOR_FRACTION = 0.02  # ondergrens voor de spreiding bij de z-score (anders geeft een vlakke reeks oneindige scores)
+
+# Regels in volgorde van prioriteit; per meting wordt hooguit één event (de eerste regel die afgaat) vastgelegd
+RULES = ('over_power', 'daylight_burning', 'dark_at_night', 'z_score')
+
+def _merge_cells(count, mean, m2, cells, other_count, other_mean, other_m2):
+    # Parallelle Welford (Chan et al.): voegt statistieken samen op de platte cel-indices, in-place
+    total = count[cells] + other_count
+    delta = other_mean - mean[cells]
+    mean[cells] += delta * other_count / total
+    m2[cells] += other_m2 + delta ** 2 * count[cells] * other_count / total
+    count[cells] = total
+
+def _pad_rows(arrays, rows):
+    return tuple(np.pad(array, ((0, rows - len(array)), (0, 0))) for array in arrays)
+
+@contextmanager
+def _file_lock(path):
+    with open(path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+class AnomalyDetector:
+    """Online detector met lopende statistieken (Welford) per lichtpunt per uur van de dag.
+
+    De toestand staat in arrays van vorm (capacity, 24) geïndexeerd op lighting_unit_id: aantal, gemiddelde en M2.
+    Een batch metingen wordt in O(1) per meting gescoord tegen de statistieken van vóór de batch en daarna
+    gevectoriseerd ingevoegd (parallelle Welford/Chan merge per cel).
+    Wat sinds de vorige snapshot is geleerd staat ook apart (pending); snapshot() voegt alleen dat deel samen met
+    het bestand, zodat web, scheduler en CLI elkaars statistieken niet overschrijven.
+    """
+
+    def __init__(self, state_path=None, min_samples=7, z_threshold=4.0, overdraw_factor=1.1):
+        self.state_path = state_path
+        self.min_samples = min_samples
+        self.z_threshold = z_threshold
+        self.overdraw_factor = overdraw_factor
+        self._lock = threading.Lock()
+        self._snapshot_at = time.monotonic()
+        self.count = np.zeros((0, 24))
+        self.mean = np.zeros((0, 24))
+        self.m2 = np.zeros((0, 24))
+        self.unit_area = np.zeros(0, dtype=np.int64)
+        self.unit_power_kw = np.zeros(0)
+        self.count, self.mean, self.m2 = self._read_state()
+        self._pending = (np.zeros_like(self.count), np.zeros_like(self.mean), np.zeros_like(self.m2))
+
+    def _read_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            with np.load(self.state_path) as state:
+                return state['count'], state['mean'], state['m2']
+        return np.zeros((0, 24)), np.zeros((0, 24)), np.zeros((0, 24))
+
+    def _ensure_capacity(self, capacity):
+        if capacity <= len(self.count):
+            return
+        self.count, self.mean, self.m2 = _pad_rows((self.count, self.mean, self.m2), capacity)
+        self._pending = _pad_rows(self._pending, capacity)
+
+    def _load_units(self, unit_ids):
+        # Metadata (gebied, vermogen) per unit id; herladen zodra er een onbekende unit in een batch zit
+        if len(unit_ids) and unit_ids.max() < len(self.unit_area) and self.unit_area[unit_ids].all():
+            return
+        units = db.session.query(LightingUnit.id, LightingUnit.area_id, LightingUnit.power_watt).all()
+        size = max([unit[0] for unit in units] + [int(unit_ids.max()) if len(unit_ids) else 0]) + 1
+        self.unit_area = np.zeros(size, dtype=np.int64)
+        self.unit_power_kw = np.zeros(size)
+        for unit_id, area_id, power_watt in units:
+            self.unit_area[unit_id] = area_id
+            self.unit_power_kw[unit_id] = (power_watt or 0) / 1000
+
+    def _score(self, unit_ids, hours, consumption_kwh):
+        # Zelfde daglichtvenster als de demo data generator; lokaal, want seed_data importeert deze module
+        from seed_data import DAYLIGHT_START_HOUR, DAYLIGHT_END_HOUR
+        count = self.count[unit_ids, hours]
+        mean = self.mean[unit_ids, hours]
+        std = np.sqrt(np.where(count > 1, self.m2[unit_ids, hours] / np.maximum(count - 1, 1), 0.0))
+        power_kw = self.unit_power_kw[unit_ids]
+        burning = consumption_kwh > BURNING_FRACTION * power_kw
+        daylight = (hours >= DAYLIGHT_START_HOUR) & (hours < DAYLIGHT_END_HOUR)
+        learned = count >= self.min_samples
+        z_score = np.abs(consumption_kwh - mean) / np.maximum(std, STD_FLOOR_FRACTION * np.maximum(power_kw, 1e-3))
+
+        conditions = [
+            (power_kw > 0) & (consumption_kwh > self.overdraw_factor * power_kw),
+            # Overdag aan terwijl dit lichtpunt op dit uur normaal uit is (anders herhaalt elk uur hetzelfde event)
+            daylight & burning & learned & (mean <= BURNING_FRACTION * power_kw),
+            ~daylight & ~burning & learned & (mean > BURNING_FRACTION * power_kw),
+            learned & (z_score > self.z_threshold),
+        ]
+        rule_index = np.select(conditions, list(range(len(RULES))), default=-1)
+        expected = np.where(learned, mean, np.nan)
+        return rule_index, expected, z_score
+
+    def _learn(self, unit_ids, hours, consumption_kwh):
+        # Batch statistieken per cel (unit, uur) en daarna samenvoegen met de bestaande toestand
+        cells = unit_ids * 24 + hours
+        size = len(self.count) * 24
+        batch_count = np.bincount(cells, minlength=size)
+        batch_sum = np.bincount(cells, weights=consumption_kwh, minlength=size)
+        touched = batch_count > 0
+        batch_mean = np.zeros(size)
+        batch_mean[touched] = batch_sum[touched] / batch_count[touched]
+        batch_m2 = np.bincount(cells, weights=(consumption_kwh - batch_mean[cells]) ** 2, minlength=size)
+
+        batch = (batch_count[touched], batch_mean[touched], batch_m2[touched])
+        for state in ((self.count, self.mean, self.m2), self._pending):
+            _merge_cells(*(array.reshape(-1) for array in state), touched, *batch)
+
+    def process(self, unit_ids, timestamps, consumption_kwh, detect=True):
+        """Scoort en leert een batch uurmetingen; geeft de events terug als dicts voor AnomalyEvent.
+
+        Met detect=False wordt alleen geleerd (bijvoorbeeld tijdens het seeden).
+        """
+        unit_ids = np.asarray(unit_ids, dtype=np.int64)
+        if len(unit_ids) == 0:
+            return []
+        timestamps = np.asarray(timestamps, dtype='datetime64[h]')
+        consumption_kwh = np.asarray(consumption_kwh, dtype=np.float64)
+        # Eén inf/NaN zou de cel (unit, uur) blijvend vergiftigen: niet scoren en niet leren
+        finite = np.isfinite(consumption_kwh)
+        if not finite.all():
+            unit_ids, timestamps, consumption_kwh = unit_ids[finite], timestamps[finite], consumption_kwh[finite]
+            if len(unit_ids) == 0:
+                return []
+        hours = (timestamps.astype(np.int64) % 24).astype(np.int64)
+
+        with self._lock:
+            self._ensure_capacity(int(unit_ids.max()) + 1)
+            events = []
+            if detect:
+                self._load_units(unit_ids)
+                known = unit_ids < len(self.unit_area)
+                known[known] = self.unit_area[unit_ids[known]] > 0
+                rule_index = np.full(len(unit_ids), -1)
+                expected = np.full(len(unit_ids), np.nan)
+                z_score = np.zeros(len(unit_ids))
+                rule_index[known], expected[known], z_score[known] = self._score(
+                    unit_ids[known], hours[known], consumption_kwh[known]
+                )
+                detected_at = datetime.now()
+                for position in np.flatnonzero(rule_index >= 0).tolist():
+                    events.append({
+                        "area_id": int(self.unit_area[unit_ids[position]]),
+                        "lighting_unit_id": int(unit_ids[position]),
+                        "timestamp": timestamps[position].astype('datetime64[s]').astype(datetime),
+                        "rule": RULES[rule_index[position]],
+                        "consumption_kwh": float(consumption_kwh[position]),
+                        "expected_kwh": None if np.isnan(expected[position]) else float(expected[position]),
+                        "score": float(z_score[position]),
+                        "detected_at": detected_at,
+                    })
+            self._learn(unit_ids, hours, consumption_kwh)
+        return events
+
+    def snapshot(self):
+        """Voegt de pending statistieken samen met het bestand (onder een file lock) en schrijft atomair weg.
+
+        Daarna is de toestand in het geheugen gelijk aan het bestand, inclusief wat andere processen hebben geleerd.
+        """
+        if not self.state_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        temp_path = self.state_path + '.tmp.npz'
+        with self._lock, _file_lock(self.state_path + '.lock'):
+            stored = self._read_state()
+            rows = max(len(stored[0]), len(self.count))
+            count, mean, m2 = _pad_rows(stored, rows)
+            pending = _pad_rows(self._pending, rows)
+            cells = np.flatnonzero(pending[0].reshape(-1))
+            if len(cells):
+                _merge_cells(count.reshape(-1), mean.reshape(-1), m2.reshape(-1), cells,
+                             *(array.reshape(-1)[cells] for array in pending))
+                np.savez(temp_path, count=count, mean=mean, m2=m2)
+                os.replace(temp_path, self.state_path)
+            self.count, self.mean, self.m2 = count, mean, m2
+            self._pending = (np.zeros_like(count), np.zeros_like(mean), np.zeros_like(m2))
+        self._snapshot_at = time.monotonic()
+
+    def maybe_snapshot(self, interval_seconds):
+        if time.monotonic() - self._snapshot_at >= interval_seconds:
+            self.snapshot()
+
+    def reset(self):
+        with self._lock:
+            self.count, self.mean, self.m2 = np.zeros((0, 24)), np.zeros((0, 24)), np.zeros((0, 24))
+            self._pending = (np.zeros((0, 24)), np.zeros((0, 24)), np.zeros((0, 24)))
+            if self.state_path and os.path.exists(self.state_path):
+                with _file_lock(self.state_path + '.lock'):
+                    os.remove(self.state_path)
+
+def get_anomaly_detector():
+    """De detector van deze app (None als ANOMALY_DETECTION_ENABLED uit staat)."""
+    config = current_app.config
+    if not config.get('ANOMALY_DETECTION_ENABLED', True):
+        return None
+    if 'anomaly_detector' not in current_app.extensions:
+        current_app.extensions['anomaly_detector'] = AnomalyDetector(
+            config.get('ANOMALY_STATE_PATH'),
+            min_samples=config.get('ANOMALY_MIN_SAMPLES', 7),
+            z_threshold=config.get('ANOMALY_Z_THRESHOLD', 4.0),
+            overdraw_factor=config.get('ANOMALY_OVERDRAW_FACTOR', 1.1),
+        )
+    return current_app.extensions['anomaly_detector']
+
+def detect_anomalies(unit_ids, timestamps, consumption_kwh):
+    """Scoort een batch met de app detector en schrijft de events in bulk weg (binnen de lopende transactie)."""
+    detector = get_anomaly_detector()
+    if detector is None:
+        return 0
+    events = detector.process(unit_ids, timestamps, consumption_kwh)
+    if events:
+        db.session.execute(AnomalyEvent.__table__.insert(), events)
+    detector.maybe_snapshot(current_app.config.get('ANOMALY_SNAPSHOT_SECONDS', 60))
+    return len(events)
+
+def learn_consumption(unit_ids, timestamps, consumption_kwh):
+    """Alleen leren, zonder events (seeding en het opbouwen vanuit de historie)."""
+    detector = get_anomaly_detector()
+    if detector is not None:
+        detector.process(unit_ids, timestamps, consumption_kwh, detect=False)
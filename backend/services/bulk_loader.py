@@ -0,0 +1,151 @@
+import io
+import time
+from datetime import datetime
+import numpy as np
+from flask import current_app
+from sqlalchemy import event
+from database import db
+from models import EnergyConsumptionData, STATUS_LABELS, STATUS_CODES
+from services.columnar_store import get_columnar_store
+
+# Een batch is een dict met numpy kolommen van gelijke lengte:
+#   lighting_unit_id (int), timestamp (datetime64), consumption_kwh (float), status_code (uint8, zie STATUS_LABELS)
+COPY_SQL = (
+    "COPY energy_consumption_data (lighting_unit_id, timestamp, consumption_kwh, status_recording, ingested_at) "
+    "FROM STDIN WITH (FORMAT text)"
+)
+
+def batch_length(batch):
+    return len(batch['lighting_unit_id'])
+
+def slice_batch(batch, start, stop):
+    return {key: column[start:stop] for key, column in batch.items()}
+
+def _resolve_method(method):
+    method = method or current_app.config.get('BULK_LOAD_METHOD', 'auto')
+    if method == 'auto':
+        return 'copy' if db.engine.dialect.name == 'postgresql' else 'insert'
+    return method
+
+def _batch_to_rows(batch):
+    labels = np.asarray(STATUS_LABELS, dtype=object)[batch['status_code']]
+    return [
+        {"lighting_unit_id": unit_id, "timestamp": ts, "consumption_kwh": kwh, "status_recording": status}
+        for unit_id, ts, kwh, status in zip(
+            batch['lighting_unit_id'].tolist(),
+            batch['timestamp'].astype('datetime64[us]').tolist(),
+            batch['consumption_kwh'].tolist(),
+            labels.tolist(),
+        )
+    ]
+
+def _copy_batch(batch):
+    timestamps = np.datetime_as_string(batch['timestamp'], unit='s')
+    labels = np.asarray(STATUS_LABELS)[batch['status_code']]
+    ingested_at = datetime.now().isoformat(sep=' ')
+    buffer = io.StringIO()
+    buffer.writelines(
+        f"{unit_id}\t{ts}\t{kwh!r}\t{status}\t{ingested_at}\n"
+        for unit_id, ts, kwh, status in zip(
+            batch['lighting_unit_id'].tolist(), timestamps.tolist(),
+            batch['consumption_kwh'].tolist(), labels.tolist(),
+        )
+    )
+    buffer.seek(0)
+    # COPY loopt via de ruwe psycopg2 connectie binnen de transactie van de sessie
+    dbapi_connection = db.session.connection().connection
+    with dbapi_connection.cursor() as cursor:
+        cursor.copy_expert(COPY_SQL, buffer)
+
+def _insert_batch(batch):
+    db.session.execute(EnergyConsumptionData.__table__.insert(), _batch_to_rows(batch))
+
+def mirror_after_commit(batch):
+    """Zet een batch klaar voor de columnar store; die wordt pas na een geslaagde commit van de sessie bijgewerkt."""
+    store = get_columnar_store()
+    if store is not None and batch_length(batch):
+        db.session.info.setdefault('columnar_pending', []).append((store, batch))
+
+@event.listens_for(db.session, 'after_commit')
+def _write_pending_columnar(session):
+    for store, batch in session.info.pop('columnar_pending', []):
+        store.write(batch['lighting_unit_id'], batch['timestamp'], batch['consumption_kwh'], batch['status_code'])
+
+@event.listens_for(db.session, 'after_transaction_end')
+def _discard_pending_columnar(session, transaction):
+    # Rollback of close zonder commit: de database heeft de rijen niet, dus de store ook niet
+    if transaction.parent is None:
+        session.info.pop('columnar_pending', None)
+
+def _rows_to_batch(rows):
+    return {
+        "lighting_unit_id": np.array([row['lighting_unit_id'] for row in rows], dtype=np.int64),
+        "timestamp": np.array([row['timestamp'] for row in rows], dtype='datetime64[s]'),
+        "consumption_kwh": np.array([row['consumption_kwh'] for row in rows], dtype=np.float64),
+        "status_code": np.array([STATUS_CODES[row['status_recording']] for row in rows], dtype=np.uint8),
+    }
+
+def write_consumption_batches(batches, method=None, chunk_size=None, label="EnergyConsumptionData"):
+    """Schrijft batches in vaste chunks weg (één commit per chunk) en rapporteert de doorvoer."""
+    method = _resolve_method(method)
+    chunk_size = chunk_size or current_app.config.get('BULK_LOAD_CHUNK_SIZE', 50000)
+    writer = _copy_batch if method == 'copy' else _insert_batch
+
+    total_rows = 0
+    started = time.perf_counter()
+    for batch in batches:
+        length = batch_length(batch)
+        for offset in range(0, length, chunk_size):
+            chunk = slice_batch(batch, offset, offset + chunk_size)
+            writer(chunk)
+            mirror_after_commit(chunk)
+            db.session.commit()
+        total_rows += length
+
+    elapsed = time.perf_counter() - started
+    rows_per_second = total_rows / elapsed if elapsed > 0 else 0.0
+    print(f"{label}: wrote {total_rows} rows in {elapsed:.2f}s ({rows_per_second:,.0f} rows/s, method={method}).")
+    return {"rows": total_rows, "seconds": elapsed, "rows_per_second": rows_per_second, "method": method}
+
+def upsert_consumption_batch(batch, overwrite=True):
+    """upsert_consumption_rows voor een numpy batch (zie boven)."""
+    return upsert_consumption_rows(_batch_to_rows(batch), overwrite)
+
+def upsert_consumption_rows(rows, overwrite=True):
+    """Insert-or-update op (lighting_unit_id, timestamp); rows is een lijst van dicts per kolom.
+
+    Met overwrite=False blijven bestaande metingen staan (insert-or-ignore), zodat herhaalde runs idempotent zijn.
+    Geeft de rijen terug die echt zijn geschreven (bij insert-or-ignore via RETURNING); alleen die gaan na de
+    commit naar de columnar store.
+    """
+    dialect = db.engine.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise RuntimeError(f"Upserts are not supported on the '{dialect}' dialect")
+    if not rows:
+        return []
+    table = EnergyConsumptionData.__table__
+    statement = insert(table)
+    if overwrite:
+        statement = statement.on_conflict_do_update(
+            index_elements=['lighting_unit_id', 'timestamp'],
+            set_={
+                "consumption_kwh": statement.excluded.consumption_kwh,
+                "status_recording": statement.excluded.status_recording,
+                "ingested_at": statement.excluded.ingested_at,
+            }
+        )
+        db.session.execute(statement, rows)
+        written = rows
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=['lighting_unit_id', 'timestamp']).returning(
+            table.c.lighting_unit_id, table.c.timestamp, table.c.consumption_kwh, table.c.status_recording
+        )
+        written = [dict(row) for row in db.session.execute(statement, rows).mappings()]
+
+    if written:
+        mirror_after_commit(_rows_to_batch(written))
+    return written
@@ -0,0 +1,161 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from flask import current_app
+from database import db
+from models import CacheGeneration
+
+class InProcessCache:
+    """Begrensde LRU cache met TTL binnen één proces.
+
+    De generaties per gebied staan in de database (cache_generations), zodat ingest in een andere worker of de CLI
+    ook de entries van dit proces ongeldig maakt.
+    """
+
+    def __init__(self, max_entries=1024, ttl_seconds=300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_generation(self, area_id):
+        return db.session.query(CacheGeneration.generation).filter(CacheGeneration.area_id == area_id).scalar() or 0
+
+    def bump_generations(self, area_ids):
+        dialect = db.engine.dialect.name
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        table = CacheGeneration.__table__
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(index_elements=['area_id'], set_={"generation": table.c.generation + 1})
+        db.session.execute(statement, [{"area_id": area_id, "generation": 1} for area_id in area_ids])
+        db.session.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        # Ook de entries van andere processen: alle generaties één omhoog
+        db.session.query(CacheGeneration).update({CacheGeneration.generation: CacheGeneration.generation + 1},
+                                                 synchronize_session=False)
+        db.session.commit()
+
+class RedisCache:
+    """Gedeelde backend voor meerdere workers; eviction via de maxmemory-policy van Redis (allkeys-lru).
+
+    Entries staan als JSON in Redis (nooit pickle: de inhoud van Redis wordt niet vertrouwd), de generaties als
+    tellers die met INCR worden opgehoogd.
+    """
+
+    def __init__(self, url, ttl_seconds=300, prefix='energy_cache'):
+        try:
+            import redis
+        except ImportError as exc:
+            raise RuntimeError("ENERGY_CACHE_BACKEND='redis' requires the 'redis' package") from exc
+        self._client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get(self, key):
+        raw = self._client.get(f"{self.prefix}:{key}")
+        if raw is None:
+            return None
+        entry = json.loads(raw)
+        entry['last_modified'] = datetime.fromisoformat(entry['last_modified'])
+        return entry
+
+    def set(self, key, value):
+        raw = json.dumps({**value, "last_modified": value['last_modified'].isoformat()})
+        self._client.set(f"{self.prefix}:{key}", raw, ex=self.ttl_seconds)
+
+    def get_generation(self, area_id):
+        return int(self._client.get(f"{self.prefix}:gen:{area_id}") or 0)
+
+    def bump_generations(self, area_ids):
+        pipeline = self._client.pipeline()
+        for area_id in area_ids:
+            pipeline.incr(f"{self.prefix}:gen:{area_id}")
+        pipeline.execute()
+
+    def clear(self):
+        for key in self._client.scan_iter(f"{self.prefix}:*"):
+            self._client.delete(key)
+
+def get_cache():
+    # Eén cache per app, lui aangemaakt op basis van de config
+    if 'energy_cache' not in current_app.extensions:
+        config = current_app.config
+        backend = config.get('ENERGY_CACHE_BACKEND', 'memory')
+        if backend == 'none':
+            cache = None
+        elif backend == 'redis':
+            cache = RedisCache(config['ENERGY_CACHE_REDIS_URL'], config.get('ENERGY_CACHE_TTL_SECONDS', 300))
+        else:
+            cache = InProcessCache(config.get('ENERGY_CACHE_MAX_ENTRIES', 1024), config.get('ENERGY_CACHE_TTL_SECONDS', 300))
+        current_app.extensions['energy_cache'] = cache
+    return current_app.extensions['energy_cache']
+
+def _build_entry(data):
+    body = current_app.json.dumps(data)
+    return {
+        "body": body,
+        "etag": hashlib.sha1(body.encode('utf-8')).hexdigest(),
+        "last_modified": datetime.now(timezone.utc).replace(microsecond=0),
+    }
+
+def cached_area_call(kind, area_id, params, compute):
+    """Geeft (entry, error) terug; entry bevat de geserialiseerde body, ETag en Last-Modified.
+
+    De key bevat het huidige uur en de generatie van het gebied, zodat nieuwe verbruiksdata
+    (invalidate_areas) en het verschuiven van het venster automatisch een nieuwe entry opleveren.
+    """
+    cache = get_cache()
+    if cache is None:
+        data, error = compute()
+        return (None, error) if error else (_build_entry(data), None)
+
+    hour_bucket = datetime.now().strftime('%Y%m%d%H')
+    key = f"{kind}:{area_id}:{params}:{hour_bucket}:g{cache.get_generation(area_id)}"
+    entry = cache.get(key)
+    if entry is None:
+        data, error = compute()
+        if error:
+            return None, error
+        entry = _build_entry(data)
+        cache.set(key, entry)
+    return entry, None
+
+def invalidate_areas(area_ids):
+    cache = get_cache()
+    area_ids = sorted(set(area_ids))
+    if cache is None or not area_ids:
+        return
+    cache.bump_generations(area_ids)
+
+def clear_cache():
+    cache = get_cache()
+    if cache is not None:
+        cache.clear()
@@ -0,0 +1,229 @@
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from models import STATUS_CODES
+
+BLOCK_HOURS = 1024
+MISSING_STATUS = 0  # status wordt opgeslagen als code + 1; 0 = geen meting (sparse nulbestanden)
+INEFFICIENT_STATUS = STATUS_CODES['Daylight_Inefficiency'] + 1
+
+def truncate_datetime64(values, resolution):
+    """Trunceert uur-timestamps (datetime64[h]) tot het begin van hun bucket: hour, day, week (maandag) of month."""
+    if resolution == 'hour':
+        return values
+    days = values.astype('datetime64[D]')
+    if resolution == 'day':
+        return days.astype('datetime64[h]')
+    if resolution == 'week':
+        # 1970-01-01 was een donderdag; schuif terug naar de maandag van dezelfde week
+        weekday = (days.astype(np.int64) + 3) % 7
+        return (days - weekday).astype('datetime64[h]')
+    if resolution == 'month':
+        return values.astype('datetime64[M]').astype('datetime64[h]')
+    raise ValueError(f"Resolution '{resolution}' is not available in the columnar store")
+
+class ColumnarStore:
+    """Uurverbruik per LightingUnit als memory-mapped float32/uint8 arrays met vaste stride.
+
+    Bestanden zijn opgeknipt in blokken van BLOCK_HOURS uur met vorm (capacity, BLOCK_HOURS);
+    rij = lighting_unit_id, kolom = uur-offset sinds de epoch binnen het blok.
+    """
+
+    def __init__(self, path, epoch, block_hours=BLOCK_HOURS):
+        self.path = path
+        self._lock = threading.RLock()
+        self._blocks = {}
+        self._meta_version = None
+        self.epoch = epoch.replace(hour=0, minute=0, second=0, microsecond=0)
+        self.block_hours = block_hours
+        self.capacity = 0
+        os.makedirs(path, exist_ok=True)
+        if not self._refresh():
+            self._write_meta()
+
+    def _meta_path(self):
+        return os.path.join(self.path, 'meta.json')
+
+    def _refresh(self):
+        # Andere processen (CLI, scheduler) kunnen de store laten groeien of resetten; meta.json wordt altijd via
+        # os.replace geschreven, dus een ander inode/mtime betekent een nieuwe vorm en worden de memmaps weggegooid
+        try:
+            stat = os.stat(self._meta_path())
+            version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            version = None
+        if version == self._meta_version:
+            return version is not None
+        self._blocks.clear()
+        self._meta_version = version
+        if version is None:
+            self.capacity = 0
+            return False
+        with open(self._meta_path()) as meta_file:
+            meta = json.load(meta_file)
+        self.epoch = datetime.fromisoformat(meta['epoch'])
+        self.block_hours = meta['block_hours']
+        self.capacity = meta['capacity']
+        return True
+
+    def _write_meta(self):
+        temp_path = self._meta_path() + '.tmp'
+        with open(temp_path, 'w') as meta_file:
+            json.dump({"epoch": self.epoch.isoformat(), "block_hours": self.block_hours, "capacity": self.capacity}, meta_file)
+        os.replace(temp_path, self._meta_path())
+        stat = os.stat(self._meta_path())
+        self._meta_version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _block_paths(self, block_index):
+        base = os.path.join(self.path, f'block_{block_index:05d}')
+        return base + '.kwh.f32', base + '.status.u8'
+
+    def _block(self, block_index, create=False):
+        block = self._blocks.get(block_index)
+        if block is not None:
+            return block
+        kwh_path, status_path = self._block_paths(block_index)
+        if not os.path.exists(kwh_path):
+            if not create or self.capacity == 0:
+                return None
+            shape = (self.capacity, self.block_hours)
+            # Nieuwe bestanden worden sparse aangemaakt; nullen betekenen 'geen meting'
+            np.memmap(kwh_path, dtype=np.float32, mode='w+', shape=shape).flush()
+            np.memmap(status_path, dtype=np.uint8, mode='w+', shape=shape).flush()
+        shape = (self.capacity, self.block_hours)
+        block = (np.memmap(kwh_path, dtype=np.float32, mode='r+', shape=shape),
+                 np.memmap(status_path, dtype=np.uint8, mode='r+', shape=shape))
+        self._blocks[block_index] = block
+        return block
+
+    def _existing_block_indexes(self):
+        return sorted(int(name[6:11]) for name in os.listdir(self.path) if name.startswith('block_') and name.endswith('.kwh.f32'))
+
+    def _grow(self, min_capacity):
+        # Meer units dan rijen: herschrijf de bestaande blokken met een grotere capaciteit
+        new_capacity = max(min_capacity, self.capacity * 2, 1024)
+        for block_index in self._existing_block_indexes():
+            old_kwh, old_status = self._block(block_index)
+            for old, dtype, path in ((old_kwh, np.float32, self._block_paths(block_index)[0]),
+                                     (old_status, np.uint8, self._block_paths(block_index)[1])):
+                grown = np.memmap(path + '.tmp', dtype=dtype, mode='w+', shape=(new_capacity, self.block_hours))
+                grown[:self.capacity] = old
+                grown.flush()
+                del grown
+                os.replace(path + '.tmp', path)
+        self._blocks.clear()
+        self.capacity = new_capacity
+        self._write_meta()
+
+    def hour_offset(self, moment):
+        return int((moment - self.epoch) // timedelta(hours=1))
+
+    def write(self, unit_ids, timestamps, consumption_kwh, status_codes):
+        """Schrijft metingen weg; timestamps als numpy datetime64, status als code uit STATUS_LABELS."""
+        unit_ids = np.asarray(unit_ids, dtype=np.int64)
+        offsets = ((np.asarray(timestamps, dtype='datetime64[h]') - np.datetime64(self.epoch, 'h'))
+                   .astype(np.int64))
+        valid = offsets >= 0
+        unit_ids, offsets = unit_ids[valid], offsets[valid]
+        consumption_kwh = np.asarray(consumption_kwh, dtype=np.float32)[valid]
+        status_codes = np.asarray(status_codes, dtype=np.uint8)[valid] + 1
+        if len(unit_ids) == 0:
+            return 0
+
+        with self._lock:
+            self._refresh()
+            if unit_ids.max() >= self.capacity:
+                self._grow(int(unit_ids.max()) + 1)
+            block_indexes = offsets // self.block_hours
+            for block_index in np.unique(block_indexes):
+                in_block = block_indexes == block_index
+                kwh, status = self._block(int(block_index), create=True)
+                columns = offsets[in_block] % self.block_hours
+                kwh[unit_ids[in_block], columns] = consumption_kwh[in_block]
+                status[unit_ids[in_block], columns] = status_codes[in_block]
+                kwh.flush()
+                status.flush()
+        return len(unit_ids)
+
+    def read(self, unit_ids, start_offset, end_offset):
+        """Geeft (kwh, status) met vorm (len(unit_ids), end_offset - start_offset) voor [start_offset, end_offset)."""
+        unit_ids = np.asarray(unit_ids, dtype=np.int64)
+        n_hours = max(0, end_offset - start_offset)
+        kwh_out = np.zeros((len(unit_ids), n_hours), dtype=np.float32)
+        status_out = np.zeros((len(unit_ids), n_hours), dtype=np.uint8)
+        with self._lock:
+            self._refresh()
+            in_range = unit_ids < self.capacity
+            rows = unit_ids[in_range]
+            offset = start_offset
+            while offset < end_offset:
+                block_index = offset // self.block_hours
+                block_start = offset % self.block_hours
+                block_stop = min(self.block_hours, block_start + (end_offset - offset))
+                block = self._block(block_index)
+                if block is not None and len(rows):
+                    target = slice(offset - start_offset, offset - start_offset + block_stop - block_start)
+                    kwh_out[in_range, target] = block[0][rows, block_start:block_stop]
+                    status_out[in_range, target] = block[1][rows, block_start:block_stop]
+                offset += block_stop - block_start
+        return kwh_out, status_out
+
+    def aggregate(self, unit_area_pairs, start_time, end_time, resolution):
+        """(area_id, bucket_start, total_kwh, inefficient_kwh) per bucket als NumPy reducties over slices."""
+        if not unit_area_pairs:
+            return []
+        pairs = sorted(unit_area_pairs, key=lambda pair: pair[1])
+        unit_ids = np.array([unit_id for unit_id, _ in pairs], dtype=np.int64)
+        unit_areas = np.array([area_id for _, area_id in pairs], dtype=np.int64)
+
+        # Alleen hele uren in [start_time, end_time], net als het filter op de ruwe timestamps
+        start_offset = max(0, -(-(start_time - self.epoch) // timedelta(hours=1)))
+        end_offset = self.hour_offset(end_time) + 1
+        if end_offset <= start_offset:
+            return []
+        kwh, status = self.read(unit_ids, start_offset, end_offset)
+        kwh = kwh.astype(np.float64)
+        inefficient = np.where(status == INEFFICIENT_STATUS, kwh, 0.0)
+        present = status != MISSING_STATUS
+
+        # Per gebied optellen: units zijn op area gesorteerd, dus reduceat over aaneengesloten rijen
+        area_ids, area_starts = np.unique(unit_areas, return_index=True)
+        area_total = np.add.reduceat(kwh, area_starts, axis=0)
+        area_inefficient = np.add.reduceat(inefficient, area_starts, axis=0)
+        area_present = np.logical_or.reduceat(present, area_starts, axis=0)
+
+        hours = np.datetime64(self.epoch, 'h') + np.arange(start_offset, end_offset)
+        unique_buckets, bucket_index = np.unique(truncate_datetime64(hours, resolution), return_inverse=True)
+
+        results = []
+        for row, area_id in enumerate(area_ids.tolist()):
+            totals = np.bincount(bucket_index, weights=area_total[row], minlength=len(unique_buckets))
+            inefficients = np.bincount(bucket_index, weights=area_inefficient[row], minlength=len(unique_buckets))
+            has_data = np.bincount(bucket_index, weights=area_present[row], minlength=len(unique_buckets)) > 0
+            for position in np.flatnonzero(has_data).tolist():
+                bucket_start = unique_buckets[position].astype('datetime64[s]').astype(datetime)
+                results.append((area_id, bucket_start, float(totals[position]), float(inefficients[position])))
+        return results
+
+    def reset(self):
+        with self._lock:
+            self._blocks.clear()
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.makedirs(self.path, exist_ok=True)
+            self.capacity = 0
+            self._write_meta()
+
+def get_columnar_store():
+    """De store als ENERGY_STORAGE_ENGINE = 'columnar', anders None (de database blijft de bron van metadata)."""
+    if current_app.config.get('ENERGY_STORAGE_ENGINE', 'sql') != 'columnar':
+        return None
+    if 'columnar_store' not in current_app.extensions:
+        current_app.extensions['columnar_store'] = ColumnarStore(
+            current_app.config['COLUMNAR_STORE_PATH'],
+            datetime.fromisoformat(current_app.config['COLUMNAR_STORE_EPOCH'])
+        )
+    return current_app.extensions['columnar_store']
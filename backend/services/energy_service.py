@@ -1,78 +1,106 @@
-from datetime import datetime, timedelta
-from database import db
-from models import Area, LightingUnit, EnergyConsumptionData, Recommendation
-from sqlalchemy import func, extract
-import random
+from datetime import datetime
+from database import db, read_replica
+from models import Area, Recommendation, AnomalyEvent
+import numpy as np
+from services.aggregation import (resolve_period, resolve_time_range, aggregate_area_series, aggregate_areas,
+                                  ISO_LABEL_FORMAT)
+from services.downsampling import lttb_indices
+from services.recommendation_engine import GENERATED_TITLES, AREA_SWITCHING_TITLE
 
-def get_aggregated_energy_data(area_id, period_str):
-    area = Area.query.get(area_id)
-    if not area:
-        return None, "Area not found"
-    
-    end_time = datetime.now()
-    
-    # Bepaal start_time en aggregation_interval/time_format_str
-    if period_str == 'day':
-        start_time = end_time - timedelta(hours=24)
-        aggregation_interval = func.to_char(EnergyConsumptionData.timestamp, 'HH24:00:00')
-    elif period_str == 'month':
-        start_time = end_time - timedelta(days=30)
-        aggregation_interval = func.to_char(EnergyConsumptionData.timestamp, 'YYYY-MM-DD')
-    else: # Default is 'week'
-        start_time = end_time - timedelta(days=7)
-        aggregation_interval = func.to_char(EnergyConsumptionData.timestamp, 'YYYY-MM-DD')
-
-    # Query voor geaggregeerd verbruik
-    aggregated_consumption = db.session.query(
-        aggregation_interval.label('interval_start'),
-        func.sum(EnergyConsumptionData.consumption_kwh).label('total_consumption')
-    ).join(LightingUnit).filter(
-        LightingUnit.area_id == area_id,
-        EnergyConsumptionData.timestamp >= start_time,
-        EnergyConsumptionData.timestamp <= end_time
-    ).group_by(
-        'interval_start'
-    ).order_by(
-        'interval_start'
-    ).all()
-    
-    formatted_data = []
-    for row in aggregated_consumption:
-        formatted_data.append({
-            "timestamp": row.interval_start, 
-            "consumption_kwh": row.total_consumption,
-        })
-    
-    # Simulatie voor inefficiëntie markering 
-    inefficiency_data_query = db.session.query(
-        aggregation_interval.label('interval_start'),
-        func.sum(EnergyConsumptionData.consumption_kwh).label('inefficient_consumption')
-    ).join(LightingUnit).filter(
-        LightingUnit.area_id == area_id,
-        EnergyConsumptionData.timestamp >= start_time,
-        EnergyConsumptionData.timestamp <= end_time,
-        EnergyConsumptionData.status_recording == 'Daylight_Inefficiency'
-    ).group_by(
-        'interval_start'
-    ).order_by(
-        'interval_start'
-    ).all()
+def _downsample_series(series, max_points):
+    # LTTB op (tijd, totaal); het inefficiënte deel gaat mee met de gekozen buckets
+    timestamps = np.array([bucket_start for bucket_start, _, _ in series], dtype='datetime64[s]').astype(np.int64)
+    totals = np.array([total_kwh for _, total_kwh, _ in series], dtype=np.float64)
+    return [series[index] for index in lttb_indices(timestamps, totals, max_points).tolist()]
+
+def _format_area_data(area_id, area_name, series, label_format, max_points=None):
+    # Het totaal komt altijd uit de volledige reeks, ook als de grafiekdata wordt gedownsampled
+    total_consumption_kwh = sum(total_kwh for _, total_kwh, _ in series) if series else 0.0
+    if max_points and len(series) > max_points:
+        series = _downsample_series(series, max_points)
 
+    formatted_data = []
     inefficiency_markers = []
-    for row in inefficiency_data_query:
-        inefficiency_markers.append({
-            "timestamp": row.interval_start, 
-            "consumption_kwh": row.inefficient_consumption
+    for bucket_start, total_kwh, inefficient_kwh in series:
+        label = bucket_start.strftime(label_format)
+        formatted_data.append({
+            "timestamp": label, 
+            "consumption_kwh": total_kwh,
         })
-    
-    total_consumption_kwh = sum([d['consumption_kwh'] for d in formatted_data]) if formatted_data else 0.0
+        # Simulatie voor inefficiëntie markering 
+        if inefficient_kwh:
+            inefficiency_markers.append({
+                "timestamp": label, 
+                "consumption_kwh": inefficient_kwh
+            })
 
     return {
         "area_id": area_id,
-        "area_name": area.name,
+        "area_name": area_name,
         "total_consumption_kwh": total_consumption_kwh,
         "chart_data": formatted_data,
         "inefficiency_markers": inefficiency_markers
+    }
+
+def get_aggregated_energy_data(area_id, period_str, start_time=None, end_time=None, resolution=None, max_points=None):
+    """Verbruik per bucket voor een periode, of voor een expliciete start/end/resolutie met ISO labels.
+
+    Met max_points wordt een lange reeks server-side gedownsampled (LTTB).
+    """
+    area = Area.query.get(area_id)
+    if not area:
+        return None, "Area not found"
+
+    if start_time is None and end_time is None and resolution is None:
+        end_time = datetime.now()
+        start_time, resolution, label_format = resolve_period(period_str, end_time)
+        explicit_range = False
+    else:
+        start_time, end_time, resolution = resolve_time_range(period_str, start_time, end_time, resolution)
+        label_format = ISO_LABEL_FORMAT
+        explicit_range = True
+
+    # Totaal en inefficiënt verbruik per bucket in één pass via de aggregatie engine (rollups), op de replica
+    with read_replica():
+        series = aggregate_area_series(area_id, start_time, end_time, resolution)
+
+    data = _format_area_data(area_id, area.name, series, label_format, max_points)
+    if explicit_range:
+        data.update({
+            "start": start_time.strftime(ISO_LABEL_FORMAT),
+            "end": end_time.strftime(ISO_LABEL_FORMAT),
+            "resolution": resolution,
+            "bucket_count": len(series),
+            "downsampled": len(data["chart_data"]) < len(series),
+        })
+    return data, None
+
+def get_batch_aggregated_energy_data(area_ids=None, city_id=None, period_str='week'):
+    """Geaggregeerde data voor meerdere gebieden tegelijk (lijst van ids, een stad, of alles bij None)."""
+    area_query = db.session.query(Area.id, Area.name)
+    if area_ids is not None:
+        area_query = area_query.filter(Area.id.in_(area_ids))
+    if city_id is not None:
+        area_query = area_query.filter(Area.city_id == city_id)
+    areas = area_query.order_by(Area.id).all()
+    if not areas:
+        return None, "No areas found"
+
+    end_time = datetime.now()
+    start_time, resolution, label_format = resolve_period(period_str, end_time)
+
+    # Alle gebieden in één gegroepeerde query in plaats van een query set per gebied
+    series_per_area = {area_id: [] for area_id, _ in areas}
+    with read_replica():
+        rows = aggregate_areas(series_per_area.keys(), start_time, end_time, resolution)
+    for area_id, bucket_start, total_kwh, inefficient_kwh in rows:
+        series_per_area[area_id].append((bucket_start, total_kwh, inefficient_kwh))
+
+    area_data = [_format_area_data(area_id, area_name, series_per_area[area_id], label_format) for area_id, area_name in areas]
+    return {
+        "period": period_str,
+        "total_consumption_kwh": sum(area['total_consumption_kwh'] for area in area_data),
+        "areas": area_data
     }, None
 
 def get_area_recommendation(area_id):
@@ -80,41 +108,35 @@ def get_area_recommendation(area_id):
     if not area:
         return None, "Area not found"
 
-    existing_rec = Recommendation.query.filter_by(
-        area_id=area_id, 
-        title='Optimaliseer Schakeltijden Openbare Verlichting'
-    ).first()
-    
-    if existing_rec:
-        rec_data = {
-            "title": existing_rec.title,
-            "description": existing_rec.description,
-            "potential_savings_kwh": existing_rec.potential_savings_kwh,
-            "potential_savings_euro": existing_rec.potential_savings_euro,
-            "percentage_savings": existing_rec.potential_savings_kwh / 50 * 100 if existing_rec.potential_savings_kwh else 0 
-        }
-    else:
-        potential_kwh_per_month = random.uniform(25.0, 75.0) 
-        potential_euro_per_month = round(potential_kwh_per_month * 0.40, 2)
-
-        new_rec = Recommendation(
-            area_id=area_id,
-            date_generated=datetime.now().date(),
-            title='Optimaliseer Schakeltijden Openbare Verlichting',
-            description='Onnodig energieverbruik gedetecteerd door straatverlichting die onnodig lang aanstaat of niet meeschaalt met de daglichturen. Door schakeltijden aan te passen of te dimmen tussen 07:00 en 18:00 uur kan significant bespaard worden.',
-            potential_savings_kwh=potential_kwh_per_month,
-            potential_savings_euro=potential_euro_per_month,
-            action_status='Nieuw'
-        )
-        db.session.add(new_rec)
-        db.session.commit()
-        rec_data = {
-            "title": new_rec.title,
-            "description": new_rec.description,
-            "potential_savings_kwh": new_rec.potential_savings_kwh,
-            "potential_savings_euro": new_rec.potential_savings_euro,
-            "percentage_savings": new_rec.potential_savings_kwh / 50 * 100 
-        }
+    # Aanbevelingen worden vooraf berekend door de recommendation engine; hier alleen een geïndexeerde read
+    recommendations = Recommendation.query.filter(
+        Recommendation.area_id == area_id,
+        Recommendation.title.in_(GENERATED_TITLES)
+    ).order_by(Recommendation.potential_savings_kwh.desc()).all()
+
+    area_rec = next((rec for rec in recommendations if rec.lighting_unit_id is None and rec.title == AREA_SWITCHING_TITLE), None)
+    if not area_rec:
+        return None, "No recommendation available yet for this area"
+
+    rec_data = {
+        "title": area_rec.title,
+        "description": area_rec.description,
+        "potential_savings_kwh": area_rec.potential_savings_kwh,
+        "potential_savings_euro": area_rec.potential_savings_euro,
+        "percentage_savings": area_rec.percentage_savings or 0,
+        "lighting_unit_recommendations": [
+            {
+                "lighting_unit_id": rec.lighting_unit_id,
+                "title": rec.title,
+                "description": rec.description,
+                "potential_savings_kwh": rec.potential_savings_kwh,
+                "potential_savings_euro": rec.potential_savings_euro,
+                "percentage_savings": rec.percentage_savings or 0,
+                "action_status": rec.action_status,
+            }
+            for rec in recommendations if rec.lighting_unit_id is not None
+        ]
+    }
 
     return rec_data, None
 
@@ -124,62 +146,52 @@ def get_simulated_savings_scenario(area_id, period_str):
         return None, "Area not found"
     
     end_time = datetime.now()
-    if period_str == 'day':
-        start_time = end_time - timedelta(hours=24)
-        aggregation_interval = func.to_char(EnergyConsumptionData.timestamp, 'HH24:00:00')
-    elif period_str == 'month':
-        start_time = end_time - timedelta(days=30)
-        aggregation_interval = func.to_char(EnergyConsumptionData.timestamp, 'YYYY-MM-DD')
-    else: # Default is 'week'
-        start_time = end_time - timedelta(days=7)
-        aggregation_interval = func.to_char(EnergyConsumptionData.timestamp, 'YYYY-MM-DD')
-            
-    # Haal het verbruiksprofiel op
-    actual_consumption_query = db.session.query(
-        aggregation_interval.label('interval_start'),
-        func.sum(EnergyConsumptionData.consumption_kwh).label('total_consumption')
-    ).join(LightingUnit).filter(
-        LightingUnit.area_id == area_id,
-        EnergyConsumptionData.timestamp >= start_time,
-        EnergyConsumptionData.timestamp <= end_time
-    ).group_by(
-        'interval_start'
-    ).order_by(
-        'interval_start'
-    ).all()
-    
-    actual_consumption_map = {row.interval_start: row.total_consumption for row in actual_consumption_query}
-
-    inefficient_consumption_query = db.session.query(
-        aggregation_interval.label('interval_start'),
-        func.sum(EnergyConsumptionData.consumption_kwh).label('inefficient_kwh')
-    ).join(LightingUnit).filter(
-        LightingUnit.area_id == area_id,
-        EnergyConsumptionData.timestamp >= start_time,
-        EnergyConsumptionData.timestamp <= end_time,
-        EnergyConsumptionData.status_recording == 'Daylight_Inefficiency'
-    ).group_by(
-        'interval_start'
-    ).order_by(
-        'interval_start'
-    ).all()
-    
-    inefficient_consumption_map = {row.interval_start: row.inefficient_kwh for row in inefficient_consumption_query}
+    start_time, resolution, label_format = resolve_period(period_str, end_time)
+
+    # Haal het verbruiksprofiel (totaal en inefficiënt deel) in één pass op
+    with read_replica():
+        series = aggregate_area_series(area_id, start_time, end_time, resolution)
 
     # Simuleer de besparing per interval: trek het inefficiënte deel af
     savings_scenario_data = []
-    all_intervals = sorted(actual_consumption_map.keys())
-
-    for interval_start_str in all_intervals:
-        actual_kwh = actual_consumption_map.get(interval_start_str, 0.0)
-        inefficient_kwh_for_interval = inefficient_consumption_map.get(interval_start_str, 0.0)
-        
+    for bucket_start, actual_kwh, inefficient_kwh_for_interval in series:
         new_kwh = actual_kwh - inefficient_kwh_for_interval
         if new_kwh < 0: new_kwh = 0
 
         savings_scenario_data.append({
-            "timestamp": interval_start_str,
+            "timestamp": bucket_start.strftime(label_format),
             "consumption_kwh": new_kwh,
         })
 
-    return savings_scenario_data, None
\ No newline at end of file
+    return savings_scenario_data, None
+
+def get_area_anomalies(area_id, start_time=None, end_time=None, rule=None, limit=100):
+    """Door de streaming detector gemarkeerde metingen van een gebied, nieuwste eerst."""
+    area = Area.query.get(area_id)
+    if not area:
+        return None, "Area not found"
+
+    query = AnomalyEvent.query.filter(AnomalyEvent.area_id == area_id)
+    if start_time is not None:
+        query = query.filter(AnomalyEvent.timestamp >= start_time)
+    if end_time is not None:
+        query = query.filter(AnomalyEvent.timestamp <= end_time)
+    if rule is not None:
+        query = query.filter(AnomalyEvent.rule == rule)
+    events = query.order_by(AnomalyEvent.timestamp.desc(), AnomalyEvent.id.desc()).limit(limit).all()
+
+    return {
+        "area_id": area_id,
+        "area_name": area.name,
+        "anomalies": [
+            {
+                "lighting_unit_id": event.lighting_unit_id,
+                "timestamp": event.timestamp.isoformat(),
+                "rule": event.rule,
+                "consumption_kwh": event.consumption_kwh,
+                "expected_kwh": event.expected_kwh,
+                "score": event.score,
+            }
+            for event in events
+        ]
+    }, None
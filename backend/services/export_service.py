@@ -0,0 +1,71 @@
+import csv
+import io
+import json
+import zlib
+from database import db
+from models import Area, LightingUnit, EnergyConsumptionData
+from sqlalchemy import select
+
+EXPORT_COLUMNS = ('lighting_unit_id', 'area_id', 'timestamp', 'consumption_kwh', 'status_recording')
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+def iter_consumption_partitions(area_ids=None, city_id=None, start_time=None, end_time=None, chunk_size=5000):
+    """Streamt ruwe metingen in partities van chunk_size rijen via een server-side cursor."""
+    statement = select(
+        EnergyConsumptionData.lighting_unit_id,
+        LightingUnit.area_id,
+        EnergyConsumptionData.timestamp,
+        EnergyConsumptionData.consumption_kwh,
+        EnergyConsumptionData.status_recording
+    ).join(LightingUnit, EnergyConsumptionData.lighting_unit_id == LightingUnit.id)
+    if area_ids is not None:
+        statement = statement.where(LightingUnit.area_id.in_(list(area_ids)))
+    if city_id is not None:
+        statement = statement.join(Area, LightingUnit.area_id == Area.id).where(Area.city_id == city_id)
+    if start_time is not None:
+        statement = statement.where(EnergyConsumptionData.timestamp >= start_time)
+    if end_time is not None:
+        statement = statement.where(EnergyConsumptionData.timestamp <= end_time)
+    # Volgorde van de unieke (lighting_unit_id, timestamp) index, zodat de database niet hoeft te sorteren
+    statement = statement.order_by(EnergyConsumptionData.lighting_unit_id, EnergyConsumptionData.timestamp)
+
+    result = db.session.execute(statement.execution_options(stream_results=True, yield_per=chunk_size))
+    try:
+        for partition in result.partitions():
+            yield partition
+    finally:
+        result.close()
+
+def _format_partition(partition, data_format):
+    if data_format == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerows((unit_id, area_id, timestamp.isoformat(), kwh, status)
+                         for unit_id, area_id, timestamp, kwh, status in partition)
+        return buffer.getvalue()
+    return ''.join(
+        json.dumps({
+            "lighting_unit_id": unit_id, "area_id": area_id, "timestamp": timestamp.isoformat(),
+            "consumption_kwh": kwh, "status_recording": status
+        }) + '\n'
+        for unit_id, area_id, timestamp, kwh, status in partition
+    )
+
+def iter_export_chunks(partitions, data_format='csv', compress=False):
+    """Zet partities om naar bytes chunks (CSV of NDJSON), optioneel als doorlopende gzip stream."""
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip header
+
+    def emit(text):
+        data = text.encode('utf-8')
+        return compressor.compress(data) if compressor else data
+
+    if data_format == 'csv':
+        chunk = emit(','.join(EXPORT_COLUMNS) + '\n')
+        if chunk:
+            yield chunk
+    for partition in partitions:
+        chunk = emit(_format_partition(partition, data_format))
+        if chunk:
+            yield chunk
+    if compressor:
+        yield compressor.flush()
@@ -0,0 +1,144 @@
+import csv
+import io
+import json
+import math
+import time
+from collections import defaultdict
+from flask import current_app
+from database import db
+from models import LightingUnit, STATUS_LABELS
+from services.bulk_loader import upsert_consumption_rows
+from services.rollup_service import refresh_rollup_hours
+from services.aggregation import parse_timestamp
+from services.cache import invalidate_areas
+from services.anomaly_detector import detect_anomalies
+from services.retention_service import compacted_through
+from services.columnar_store import get_columnar_store
+
+MAX_ERRORS_PER_BATCH = 20
+UNDECODABLE = object()  # marker voor een regel met bytes die geen UTF-8 zijn
+
+class UnitRegistry:
+    """Gecachte mapping lighting_unit_id -> area_id; herladen bij onbekende ids (hooguit eens per interval)."""
+
+    def __init__(self, refresh_seconds=60):
+        self.refresh_seconds = refresh_seconds
+        self._unit_areas = {}
+        self._loaded_at = None
+
+    def _reload(self):
+        self._unit_areas = dict(db.session.query(LightingUnit.id, LightingUnit.area_id).all())
+        self._loaded_at = time.monotonic()
+
+    def area_for(self, unit_id):
+        if self._loaded_at is None:
+            self._reload()
+        area_id = self._unit_areas.get(unit_id)
+        if area_id is None and time.monotonic() - self._loaded_at > self.refresh_seconds:
+            self._reload()
+            area_id = self._unit_areas.get(unit_id)
+        return area_id
+
+def get_unit_registry():
+    if 'unit_registry' not in current_app.extensions:
+        current_app.extensions['unit_registry'] = UnitRegistry(current_app.config.get('INGEST_UNIT_CACHE_SECONDS', 60))
+    return current_app.extensions['unit_registry']
+
+def _iter_records(text_stream, data_format):
+    # Levert (regelnummer, dict) per record zonder de hele body in het geheugen te laden; de stream decodeert met
+    # errors='replace', dus ongeldige UTF-8 wordt U+FFFD en alleen dat record wordt afgekeurd
+    if data_format == 'csv':
+        for line_number, record in enumerate(csv.DictReader(text_stream), start=2):
+            yield line_number, UNDECODABLE if '\ufffd' in str(record) else record
+    else:
+        for line_number, line in enumerate(text_stream, start=1):
+            if '\ufffd' in line:
+                yield line_number, UNDECODABLE
+            elif line.strip():
+                try:
+                    yield line_number, json.loads(line)
+                except ValueError:
+                    yield line_number, None
+
+def _validate(record, registry, boundary=None, hourly_only=False):
+    if record is UNDECODABLE:
+        raise ValueError("invalid UTF-8")
+    if not isinstance(record, dict):
+        raise ValueError("invalid record")
+    unit_id = int(record['lighting_unit_id'])
+    area_id = registry.area_for(unit_id)
+    if area_id is None:
+        raise ValueError(f"unknown lighting_unit_id {unit_id}")
+    consumption = float(record['consumption_kwh'])
+    if not (math.isfinite(consumption) and consumption >= 0):
+        raise ValueError("consumption_kwh must be a finite number >= 0")
+    status = record.get('status') or record.get('status_recording') or 'Normal'
+    if status not in STATUS_LABELS:
+        raise ValueError(f"unknown status {status!r}")
+    timestamp = parse_timestamp(record['timestamp'])
+    if boundary is not None and timestamp < boundary:
+        # Die dag is al gecompacteerd; een losse ruwe meting zou de dagtotalen en rollups uit elkaar trekken
+        raise ValueError(f"timestamp before the retention boundary {boundary.isoformat()}")
+    if hourly_only and timestamp != timestamp.replace(minute=0, second=0, microsecond=0):
+        # De columnar store heeft één slot per uur; een tweede meting in hetzelfde uur zou de eerste overschrijven
+        raise ValueError("timestamp must be on the hour when the columnar store is active")
+    return area_id, {
+        "lighting_unit_id": unit_id,
+        "timestamp": timestamp,
+        "consumption_kwh": consumption,
+        "status_recording": status,
+    }
+
+def _flush_batch(batch_number, rows_by_key, area_hours, rejected, errors):
+    rows = list(rows_by_key.values())
+    if rows:
+        upsert_consumption_rows(rows)
+        timestamps = [row['timestamp'] for row in rows]
+        refresh_rollup_hours(area_hours, commit=False)
+        detect_anomalies([row['lighting_unit_id'] for row in rows], timestamps, [row['consumption_kwh'] for row in rows])
+    db.session.commit()
+    invalidate_areas(area_hours)
+    return {"batch": batch_number, "accepted": len(rows), "rejected": rejected, "errors": errors}
+
+def ingest_readings(binary_stream, data_format='ndjson', batch_size=None):
+    """Streamt NDJSON/CSV meterstanden in gebatchte upsert transacties.
+
+    Dubbele (lighting_unit_id, timestamp) binnen een batch: de laatste wint; bestaande rijen worden overschreven.
+    """
+    batch_size = batch_size or current_app.config.get('INGEST_BATCH_SIZE', 5000)
+    registry = get_unit_registry()
+    boundary = compacted_through()
+    hourly_only = get_columnar_store() is not None
+    text_stream = io.TextIOWrapper(binary_stream, encoding='utf-8', errors='replace', newline='')
+
+    batches = []
+    rows_by_key, area_hours, rejected, errors = {}, defaultdict(set), 0, []
+    started = time.perf_counter()
+    for line_number, record in _iter_records(text_stream, data_format):
+        try:
+            area_id, row = _validate(record, registry, boundary, hourly_only)
+        except (KeyError, TypeError, ValueError) as exc:
+            rejected += 1
+            if len(errors) < MAX_ERRORS_PER_BATCH:
+                errors.append({"line": line_number, "error": str(exc) if not isinstance(exc, KeyError) else f"missing field {exc}"})
+        else:
+            rows_by_key[(row['lighting_unit_id'], row['timestamp'])] = row
+            area_hours[area_id].add(row['timestamp'].replace(minute=0, second=0, microsecond=0))
+
+        if len(rows_by_key) + rejected >= batch_size:
+            batches.append(_flush_batch(len(batches) + 1, rows_by_key, area_hours, rejected, errors))
+            rows_by_key, area_hours, rejected, errors = {}, defaultdict(set), 0, []
+
+    if rows_by_key or rejected:
+        batches.append(_flush_batch(len(batches) + 1, rows_by_key, area_hours, rejected, errors))
+
+    elapsed = time.perf_counter() - started
+    accepted = sum(batch['accepted'] for batch in batches)
+    total_rejected = sum(batch['rejected'] for batch in batches)
+    return {
+        "accepted": accepted,
+        "rejected": total_rejected,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round((accepted + total_rejected) / elapsed) if elapsed > 0 else None,
+        "batches": batches,
+    }
@@ -0,0 +1,83 @@
+from models import City, Area, LightingUnit
+from sqlalchemy import select
+from sqlalchemy.orm import load_only, selectinload
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+def _keyset_page(query, id_column, cursor, limit):
+    # Keyset paginatie op de primary key: 'id > cursor' blijft even snel op de laatste als op de eerste pagina
+    if cursor is not None:
+        query = query.filter(id_column > cursor)
+    rows = query.order_by(id_column).limit(limit + 1).all()
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def _area_dict(area):
+    return {"id": area.id, "city_id": area.city_id, "name": area.name}
+
+def _unit_dict(unit):
+    return {"id": unit.id, "area_id": unit.area_id, "unit_type": unit.unit_type,
+            "location": unit.location, "power_watt": unit.power_watt}
+
+def list_cities(cursor=None, limit=DEFAULT_PAGE_SIZE, include_areas=False):
+    """Eén pagina steden; met include_areas één extra (selectin) query voor de gebieden van de hele pagina."""
+    query = City.query.options(load_only(City.id, City.name))
+    if include_areas:
+        query = query.options(selectinload(City.areas).load_only(Area.id, Area.city_id, Area.name))
+    cities, next_cursor = _keyset_page(query, City.id, cursor, limit)
+    items = []
+    for city in cities:
+        item = {"id": city.id, "name": city.name}
+        if include_areas:
+            item["areas"] = [_area_dict(area) for area in sorted(city.areas, key=lambda area: area.id)]
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor}
+
+def list_areas(city_id=None, cursor=None, limit=DEFAULT_PAGE_SIZE, include_lighting_units=False):
+    """Eén pagina gebieden, optioneel gefilterd op stad en met de lichtpunten per gebied."""
+    query = Area.query.options(load_only(Area.id, Area.city_id, Area.name, Area.description))
+    if city_id is not None:
+        query = query.filter(Area.city_id == city_id)
+    if include_lighting_units:
+        query = query.options(selectinload(Area.lighting_units).load_only(
+            LightingUnit.id, LightingUnit.area_id, LightingUnit.unit_type, LightingUnit.location, LightingUnit.power_watt
+        ))
+    areas, next_cursor = _keyset_page(query, Area.id, cursor, limit)
+    items = []
+    for area in areas:
+        item = dict(_area_dict(area), description=area.description)
+        if include_lighting_units:
+            item["lighting_units"] = [_unit_dict(unit) for unit in sorted(area.lighting_units, key=lambda unit: unit.id)]
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor}
+
+def list_lighting_units(city_id=None, area_id=None, unit_type=None, power_watt=None, min_power_watt=None,
+                        max_power_watt=None, cursor=None, limit=DEFAULT_PAGE_SIZE, include_area=False):
+    """Eén pagina lichtpunten met filters op stad, gebied, type en vermogen; include_area laadt het gebied mee."""
+    query = LightingUnit.query.options(load_only(
+        LightingUnit.id, LightingUnit.area_id, LightingUnit.unit_type, LightingUnit.location, LightingUnit.power_watt
+    ))
+    if city_id is not None:
+        # Subquery in plaats van een join: de keyset blijft op lighting_units.id
+        query = query.filter(LightingUnit.area_id.in_(select(Area.id).where(Area.city_id == city_id)))
+    if area_id is not None:
+        query = query.filter(LightingUnit.area_id == area_id)
+    if unit_type is not None:
+        query = query.filter(LightingUnit.unit_type == unit_type)
+    if power_watt is not None:
+        query = query.filter(LightingUnit.power_watt == power_watt)
+    if min_power_watt is not None:
+        query = query.filter(LightingUnit.power_watt >= min_power_watt)
+    if max_power_watt is not None:
+        query = query.filter(LightingUnit.power_watt <= max_power_watt)
+    if include_area:
+        query = query.options(selectinload(LightingUnit.area).load_only(Area.id, Area.city_id, Area.name))
+    units, next_cursor = _keyset_page(query, LightingUnit.id, cursor, limit)
+    items = []
+    for unit in units:
+        item = _unit_dict(unit)
+        if include_area:
+            item["area"] = _area_dict(unit.area)
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor}
@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from database import db
+from models import LightingUnit, EnergyConsumptionData, Recommendation, AreaHourlyConsumption
+from sqlalchemy import func, case
+from services.aggregation import inefficient_kwh_sum, INEFFICIENT_STATUS
+from services.cache import invalidate_areas
+from services.watermarks import get_watermark
+
+RECOMMENDATION_WATERMARK = 'recommendations'
+AREA_SWITCHING_TITLE = 'Optimaliseer Schakeltijden Openbare Verlichting'
+UNIT_SWITCHING_TITLE = 'Optimaliseer Schakeltijden Lichtpunt'
+UNIT_RETROFIT_TITLE = 'Vervang Armatuur door LED'
+GENERATED_TITLES = (AREA_SWITCHING_TITLE, UNIT_SWITCHING_TITLE, UNIT_RETROFIT_TITLE)
+AREA_SWITCHING_DESCRIPTION = (
+    'Onnodig energieverbruik gedetecteerd door straatverlichting die onnodig lang aanstaat of niet meeschaalt '
+    'met de daglichturen. Door schakeltijden aan te passen of te dimmen tussen 07:00 en 18:00 uur kan significant '
+    'bespaard worden.'
+)
+HOURS_PER_MONTH = 30 * 24
+
+def _unit_statistics(area_ids, start_time, end_time):
+    # Eén gegroepeerde query voor alle units: totaal, inefficiënt deel, gemeten uren en uren overdag aan
+    query = db.session.query(
+        LightingUnit.id,
+        LightingUnit.area_id,
+        LightingUnit.unit_type,
+        LightingUnit.location,
+        LightingUnit.power_watt,
+        func.sum(EnergyConsumptionData.consumption_kwh),
+        inefficient_kwh_sum(),
+        func.count(EnergyConsumptionData.id),
+        func.sum(case((EnergyConsumptionData.status_recording == INEFFICIENT_STATUS, 1), else_=0))
+    ).join(EnergyConsumptionData, EnergyConsumptionData.lighting_unit_id == LightingUnit.id).filter(
+        EnergyConsumptionData.timestamp >= start_time,
+        EnergyConsumptionData.timestamp <= end_time
+    )
+    if area_ids is not None:
+        query = query.filter(LightingUnit.area_id.in_(list(area_ids)))
+    return query.group_by(LightingUnit.id).order_by(LightingUnit.id).all()
+
+def generate_recommendations(area_ids=None, now=None):
+    """Berekent aanbevelingen per gebied en per lichtpunt uit het werkelijke verbruik en schrijft ze in bulk weg.
+
+    Geeft het aantal geschreven aanbevelingen terug.
+    """
+    config = current_app.config
+    now = now or datetime.now()
+    window_days = config.get('RECOMMENDATION_WINDOW_DAYS', 30)
+    price = config.get('RECOMMENDATION_PRICE_PER_KWH', 0.40)
+    led_power = config.get('RECOMMENDATION_LED_POWER_WATT', 50)
+
+    rows = _unit_statistics(area_ids, now - timedelta(days=window_days), now)
+    if not rows:
+        return 0
+
+    unit_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    unit_areas = np.array([row[1] for row in rows], dtype=np.int64)
+    power_watt = np.array([row[4] or 0 for row in rows], dtype=np.float64)
+    total_kwh = np.array([row[5] or 0.0 for row in rows], dtype=np.float64)
+    inefficient_kwh = np.array([row[6] or 0.0 for row in rows], dtype=np.float64)
+    hours_measured = np.array([row[7] for row in rows], dtype=np.float64)
+    inefficient_hours = np.array([row[8] or 0 for row in rows], dtype=np.int64)
+
+    # Alles omrekenen naar een maand, ook als er (nog) minder dan het volledige venster aan data is
+    month_scale = HOURS_PER_MONTH / np.maximum(hours_measured, 1)
+    monthly_total = total_kwh * month_scale
+    switching_kwh = inefficient_kwh * month_scale
+    # LED vervanging: het resterende (nodige) verbruik schaalt mee met het lagere vermogen
+    retrofit_ratio = np.where(power_watt > led_power, 1 - led_power / np.where(power_watt > 0, power_watt, 1), 0.0)
+    retrofit_kwh = (monthly_total - switching_kwh) * retrofit_ratio
+
+    area_index, area_positions = np.unique(unit_areas, return_inverse=True)
+    area_total = np.bincount(area_positions, weights=monthly_total)
+    area_switching = np.bincount(area_positions, weights=switching_kwh)
+
+    today = now.date()
+    new_rows = []
+    for position, area_id in enumerate(area_index.tolist()):
+        new_rows.append({
+            "area_id": area_id, "lighting_unit_id": None, "date_generated": today,
+            "title": AREA_SWITCHING_TITLE, "description": AREA_SWITCHING_DESCRIPTION,
+            "potential_savings_kwh": float(area_switching[position]),
+            "potential_savings_euro": round(float(area_switching[position]) * price, 2),
+            "percentage_savings": float(area_switching[position] / area_total[position] * 100) if area_total[position] else 0.0,
+        })
+    for position in np.flatnonzero(switching_kwh > 0).tolist():
+        new_rows.append({
+            "area_id": int(unit_areas[position]), "lighting_unit_id": int(unit_ids[position]), "date_generated": today,
+            "title": UNIT_SWITCHING_TITLE,
+            "description": f'Lichtpunt {rows[position][3]} brandde {int(inefficient_hours[position])} uur overdag in de afgelopen '
+                           f'{window_days} dagen. Door de schakeltijden aan te passen kan dit verbruik vermeden worden.',
+            "potential_savings_kwh": float(switching_kwh[position]),
+            "potential_savings_euro": round(float(switching_kwh[position]) * price, 2),
+            "percentage_savings": float(switching_kwh[position] / monthly_total[position] * 100) if monthly_total[position] else 0.0,
+        })
+    for position in np.flatnonzero(retrofit_kwh > 0).tolist():
+        new_rows.append({
+            "area_id": int(unit_areas[position]), "lighting_unit_id": int(unit_ids[position]), "date_generated": today,
+            "title": UNIT_RETROFIT_TITLE,
+            "description": f'Vervang de {rows[position][2]} armatuur ({int(power_watt[position])} W) op {rows[position][3]} '
+                           f'door een LED armatuur van {led_power} W.',
+            "potential_savings_kwh": float(retrofit_kwh[position]),
+            "potential_savings_euro": round(float(retrofit_kwh[position]) * price, 2),
+            "percentage_savings": float(retrofit_kwh[position] / monthly_total[position] * 100) if monthly_total[position] else 0.0,
+        })
+
+    # Vervang eerder gegenereerde aanbevelingen van deze gebieden; de actiestatus blijft behouden
+    affected_areas = area_index.tolist()
+    existing = Recommendation.query.filter(
+        Recommendation.area_id.in_(affected_areas),
+        Recommendation.title.in_(GENERATED_TITLES)
+    )
+    previous_status = {(rec.area_id, rec.lighting_unit_id, rec.title): rec.action_status
+                       for rec in existing.with_entities(Recommendation.area_id, Recommendation.lighting_unit_id,
+                                                         Recommendation.title, Recommendation.action_status)}
+    existing.delete(synchronize_session=False)
+    for row in new_rows:
+        row["action_status"] = previous_status.get((row["area_id"], row["lighting_unit_id"], row["title"]), 'Nieuw')
+    db.session.execute(Recommendation.__table__.insert(), new_rows)
+    db.session.commit()
+    invalidate_areas(affected_areas)
+    return len(new_rows)
+
+def refresh_recommendations(full=False):
+    """Draait de engine alleen voor gebieden waarvan de rollups sinds de vorige run zijn bijgewerkt."""
+    started_at = datetime.now()
+    watermark = get_watermark(RECOMMENDATION_WATERMARK)
+
+    if full or watermark.last_timestamp is None:
+        area_ids = None
+    else:
+        area_ids = [row[0] for row in db.session.query(AreaHourlyConsumption.area_id).filter(
+            AreaHourlyConsumption.updated_at > watermark.last_timestamp
+        ).distinct().all()]
+
+    written = generate_recommendations(area_ids, started_at) if area_ids is None or area_ids else 0
+    watermark.last_timestamp = started_at
+    watermark.updated_at = datetime.now()
+    db.session.commit()
+    return written
@@ -0,0 +1,140 @@
+import re
+from datetime import datetime, timedelta
+from flask import current_app
+from database import db
+from models import LightingUnit, EnergyConsumptionData, DailyUnitConsumption, ProcessingWatermark, AnomalyEvent
+from sqlalchemy import func, case, select, literal, text, Date
+from services.watermarks import get_watermark
+
+RETENTION_WATERMARK = 'raw_retention'
+
+def compacted_through():
+    """Begin van de eerste dag die nog als ruwe data bestaat; alles daarvoor staat in daily_unit_consumption."""
+    watermark = db.session.get(ProcessingWatermark, RETENTION_WATERMARK)
+    return watermark.last_timestamp if watermark is not None else None
+
+def retention_cutoff(now=None):
+    """Dagen vóór deze grens worden gecompacteerd (None als de retentie uit staat).
+
+    De grens valt nooit binnen het langste venster dat ruwe uurdata per lichtpunt leest (maandscenario's,
+    aanbevelingen); voor de gebiedsreeksen bewaren de area rollups de volledige historie.
+    """
+    from services.aggregation import PERIODS
+    config = current_app.config
+    retention_days = config.get('RAW_RETENTION_DAYS', 90)
+    if retention_days <= 0:
+        return None
+    longest_window = max(PERIODS['month'][0].days, config.get('RECOMMENDATION_WINDOW_DAYS', 30))
+    retention_days = max(retention_days, longest_window + 1)
+    now = now or datetime.now()
+    return now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=retention_days)
+
+def _set_compacted_through(day_start):
+    watermark = get_watermark(RETENTION_WATERMARK)
+    watermark.last_timestamp = day_start
+    watermark.updated_at = datetime.now()
+
+def _compact_day(day_start):
+    # Eén INSERT ... SELECT per dag; een eerdere (gedeeltelijke) compactie van dezelfde dag wordt vervangen
+    from services.aggregation import inefficient_kwh_sum  # lokaal: aggregation importeert deze module
+    day_end = day_start + timedelta(days=1)
+    db.session.query(DailyUnitConsumption).filter(DailyUnitConsumption.day == day_start.date()).delete(synchronize_session=False)
+    raw = EnergyConsumptionData
+    daily_rows = select(
+        raw.lighting_unit_id,
+        literal(day_start.date(), Date),
+        LightingUnit.area_id,
+        func.sum(raw.consumption_kwh),
+        inefficient_kwh_sum(),
+        func.sum(case((raw.consumption_kwh > 0, 1), else_=0)),
+        func.count(raw.id),
+    ).join(LightingUnit, LightingUnit.id == raw.lighting_unit_id).where(
+        raw.timestamp >= day_start,
+        raw.timestamp < day_end
+    ).group_by(raw.lighting_unit_id, LightingUnit.area_id)
+    result = db.session.execute(DailyUnitConsumption.__table__.insert().from_select(
+        ['lighting_unit_id', 'day', 'area_id', 'total_kwh', 'inefficient_kwh', 'hours_on', 'readings'], daily_rows
+    ))
+    return result.rowcount
+
+def compact_consumption(cutoff):
+    """Compacteert alle hele dagen vóór cutoff tot dagtotalen per lichtpunt; één transactie per dag.
+
+    De watermark schuift per dag mee, zodat een afgebroken run op de volgende dag verdergaat en de leesqueries
+    ruwe en gecompacteerde data nooit dubbel tellen.
+    """
+    day_start = compacted_through()
+    if day_start is None:
+        first_timestamp = db.session.query(func.min(EnergyConsumptionData.timestamp)).scalar()
+        if first_timestamp is None:
+            return 0
+        day_start = first_timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    days = 0
+    while day_start < cutoff:
+        _compact_day(day_start)
+        day_start += timedelta(days=1)
+        _set_compacted_through(day_start)
+        db.session.commit()
+        days += 1
+    return days
+
+def _expired_partitions(boundary):
+    # Alleen als energy_consumption_data een gepartitioneerde PostgreSQL tabel is (RANGE op timestamp)
+    rows = db.session.execute(text(
+        "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+        "FROM pg_inherits JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = :table"
+    ), {"table": EnergyConsumptionData.__tablename__}).all()
+    expired = []
+    for name, bound in rows:
+        match = re.search(r"TO \('([^']+)'\)", bound or '')
+        if match and datetime.fromisoformat(match.group(1)) <= boundary:
+            expired.append(name)
+    return expired
+
+def delete_expired_raw(boundary, batch_size=None):
+    """Verwijdert ruwe rijen vóór boundary: hele partities op PostgreSQL, anders in begrensde batches."""
+    batch_size = batch_size or current_app.config.get('RETENTION_DELETE_BATCH_SIZE', 10000)
+    if db.engine.dialect.name == 'postgresql':
+        for partition in _expired_partitions(boundary):
+            db.session.execute(text(f'DROP TABLE IF EXISTS "{partition}"'))
+            db.session.commit()
+    return _delete_before(EnergyConsumptionData, boundary, batch_size)
+
+def _delete_before(model, boundary, batch_size):
+    # Korte transacties: de tabel blijft beschikbaar voor ingest en lezers
+    deleted = 0
+    while True:
+        expired_ids = select(model.id).where(model.timestamp < boundary).limit(batch_size).scalar_subquery()
+        result = db.session.execute(model.__table__.delete().where(model.id.in_(expired_ids)))
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+def delete_expired_events(boundary, batch_size=None):
+    """Anomalie events leven net zo lang als de ruwe metingen waar ze naar verwijzen."""
+    batch_size = batch_size or current_app.config.get('RETENTION_DELETE_BATCH_SIZE', 10000)
+    return _delete_before(AnomalyEvent, boundary, batch_size)
+
+def apply_retention(now=None):
+    """Compacteer dagen buiten het retentievenster en verwijder daarna de bijbehorende ruwe rijen."""
+    cutoff = retention_cutoff(now)
+    if cutoff is None:
+        return {"compacted_days": 0, "deleted_rows": 0, "deleted_events": 0}
+    compacted_days = compact_consumption(cutoff)
+    boundary = compacted_through()
+    if boundary is None:
+        return {"compacted_days": compacted_days, "deleted_rows": 0, "deleted_events": 0}
+    return {"compacted_days": compacted_days, "deleted_rows": delete_expired_raw(boundary),
+            "deleted_events": delete_expired_events(boundary)}
+
+def reset_retention():
+    """Wist de gecompacteerde data en de watermark (bij het opnieuw genereren van alle verbruiksdata)."""
+    DailyUnitConsumption.query.delete()
+    watermark = db.session.get(ProcessingWatermark, RETENTION_WATERMARK)
+    if watermark is not None:
+        db.session.delete(watermark)
+    db.session.commit()
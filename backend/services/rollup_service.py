@@ -0,0 +1,177 @@
+from datetime import datetime, timedelta
+from flask import current_app
+from database import db
+from models import LightingUnit, EnergyConsumptionData, AreaHourlyConsumption, AreaDailyConsumption
+from sqlalchemy import func
+from services.aggregation import aggregate_raw, bucket_expr, as_datetime, floor_day
+from services.cache import invalidate_areas, clear_cache
+from services.retention_service import compacted_through
+from services.watermarks import get_watermark
+
+ROLLUP_WATERMARK = 'area_rollups'
+
+def reset_rollups():
+    """Leegt de rollups en zet de watermark terug (na het wissen van de ruwe data)."""
+    AreaHourlyConsumption.query.delete()
+    AreaDailyConsumption.query.delete()
+    watermark = get_watermark(ROLLUP_WATERMARK)
+    watermark.last_timestamp = None
+    watermark.updated_at = datetime.now()
+    db.session.commit()
+    clear_cache()
+
+def refresh_rollups():
+    """Catch-up job: herberekent de rollups rond alle ruwe rijen die sinds de watermark zijn ingevoerd.
+
+    De watermark is de hoogste ingested_at van de vorige run; rijen tot ROLLUP_WATERMARK_OVERLAP_SECONDS daarvóór
+    worden opnieuw meegenomen, omdat een transactie die eerder begon later kan committen (ids en ingested_at lopen
+    niet gelijk op met de commitvolgorde). Herberekenen van een venster is idempotent.
+    Geeft de set area_ids terug waarvan rollups zijn bijgewerkt.
+    """
+    watermark = get_watermark(ROLLUP_WATERMARK)
+    raw = EnergyConsumptionData
+    new_rows = db.session.query(
+        LightingUnit.area_id,
+        func.min(raw.timestamp),
+        func.max(raw.timestamp),
+        func.max(raw.ingested_at)
+    ).join(LightingUnit)
+    if watermark.last_timestamp is not None:
+        overlap = timedelta(seconds=current_app.config.get('ROLLUP_WATERMARK_OVERLAP_SECONDS', 300))
+        new_rows = new_rows.filter(raw.ingested_at > watermark.last_timestamp - overlap)
+    new_rows = new_rows.group_by(LightingUnit.area_id).all()
+    if not new_rows:
+        db.session.commit()
+        return set()
+
+    touched_areas = set()
+    for area_id, min_timestamp, max_timestamp, _ in new_rows:
+        refresh_rollup_window([area_id], min_timestamp, max_timestamp, commit=False)
+        touched_areas.add(area_id)
+
+    watermark.last_timestamp = max([row[3] for row in new_rows] + [watermark.last_timestamp or datetime.min])
+    watermark.updated_at = datetime.now()
+    db.session.commit()
+    invalidate_areas(touched_areas)
+    return touched_areas
+
+def refresh_rollup_window(area_ids, start_time, end_time, commit=True):
+    """Herberekent de uur- en dagrollups van de gegeven gebieden voor alle uren in [start_time, end_time].
+
+    Uren vóór de compactiegrens bestaan niet meer als ruwe data; daar blijven de rollups staan zoals ze zijn.
+    """
+    area_ids = list(area_ids)
+    if not area_ids:
+        return
+    hour_start = start_time.replace(minute=0, second=0, microsecond=0)
+    hour_end = end_time.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    boundary = compacted_through()
+    if boundary is not None:
+        hour_start = max(hour_start, boundary)
+    if hour_start >= hour_end:
+        return
+    now = datetime.now()
+
+    hourly_rows = aggregate_raw(area_ids, hour_start, hour_end, 'hour', end_exclusive=True)
+
+    AreaHourlyConsumption.query.filter(
+        AreaHourlyConsumption.area_id.in_(area_ids),
+        AreaHourlyConsumption.bucket_start >= hour_start,
+        AreaHourlyConsumption.bucket_start < hour_end
+    ).delete(synchronize_session=False)
+    if hourly_rows:
+        db.session.execute(AreaHourlyConsumption.__table__.insert(), [
+            {"area_id": area_id, "bucket_start": bucket, "total_kwh": total,
+             "inefficient_kwh": inefficient, "updated_at": now}
+            for area_id, bucket, total, inefficient in hourly_rows
+        ])
+
+    # Dagrollups opnieuw opbouwen uit de (kleine) uurrollups van de geraakte dagen
+    day_start = floor_day(hour_start)
+    day_end = floor_day(hour_end - timedelta(hours=1)) + timedelta(days=1)
+    day_bucket = bucket_expr(AreaHourlyConsumption.bucket_start, 'day').label('day')
+    daily_rows = db.session.query(
+        AreaHourlyConsumption.area_id,
+        day_bucket,
+        func.sum(AreaHourlyConsumption.total_kwh),
+        func.sum(AreaHourlyConsumption.inefficient_kwh)
+    ).filter(
+        AreaHourlyConsumption.area_id.in_(area_ids),
+        AreaHourlyConsumption.bucket_start >= day_start,
+        AreaHourlyConsumption.bucket_start < day_end
+    ).group_by(AreaHourlyConsumption.area_id, 'day').all()
+
+    AreaDailyConsumption.query.filter(
+        AreaDailyConsumption.area_id.in_(area_ids),
+        AreaDailyConsumption.day >= day_start.date(),
+        AreaDailyConsumption.day < day_end.date()
+    ).delete(synchronize_session=False)
+    if daily_rows:
+        db.session.execute(AreaDailyConsumption.__table__.insert(), [
+            {"area_id": area_id, "day": as_datetime(day).date(), "total_kwh": total or 0.0,
+             "inefficient_kwh": inefficient or 0.0, "updated_at": now}
+            for area_id, day, total, inefficient in daily_rows
+        ])
+
+    if commit:
+        db.session.commit()
+        invalidate_areas(area_ids)
+
+def refresh_rollup_hours(area_hours, commit=True):
+    """Herberekent alleen de geraakte uren: area_hours is {area_id: set van uur-starts}.
+
+    Aaneengesloten uren van een gebied worden één venster en gebieden met hetzelfde venster één aanroep, zodat een
+    late meting niet het hele bereik tussen die meting en de rest van de batch laat herberekenen.
+    """
+    windows = {}
+    for area_id, hours in area_hours.items():
+        run_start = previous = None
+        for hour in sorted(hours):
+            if previous is None or hour - previous > timedelta(hours=1):
+                if run_start is not None:
+                    windows.setdefault((run_start, previous), set()).add(area_id)
+                run_start = hour
+            previous = hour
+        if run_start is not None:
+            windows.setdefault((run_start, previous), set()).add(area_id)
+    for (start_time, end_time), area_ids in sorted(windows.items()):
+        refresh_rollup_window(area_ids, start_time, end_time, commit=False)
+    if commit:
+        db.session.commit()
+        invalidate_areas(area_hours)
+
+def check_rollup_consistency(area_id=None, start_time=None, end_time=None, tolerance=1e-6):
+    """Vergelijkt de uurrollups met een herberekening uit de ruwe tabel en geeft de afwijkingen terug.
+
+    Uren vóór de compactiegrens (retentie) bestaan niet meer als ruwe data en worden overgeslagen.
+    """
+    boundary = compacted_through()
+    if boundary is not None and (start_time is None or start_time < boundary):
+        start_time = boundary
+    raw = {(row[0], row[1]): (row[2], row[3])
+           for row in aggregate_raw([area_id] if area_id is not None else None, start_time, end_time, 'hour')}
+
+    rollup_query = db.session.query(
+        AreaHourlyConsumption.area_id, AreaHourlyConsumption.bucket_start,
+        AreaHourlyConsumption.total_kwh, AreaHourlyConsumption.inefficient_kwh
+    )
+    if area_id is not None:
+        rollup_query = rollup_query.filter(AreaHourlyConsumption.area_id == area_id)
+    if start_time is not None:
+        rollup_query = rollup_query.filter(AreaHourlyConsumption.bucket_start >= start_time)
+    if end_time is not None:
+        rollup_query = rollup_query.filter(AreaHourlyConsumption.bucket_start <= end_time)
+    rollup = {(row[0], row[1]): (row[2], row[3]) for row in rollup_query.all()}
+
+    mismatches = []
+    for key in sorted(set(raw) | set(rollup)):
+        expected = raw.get(key, (0.0, 0.0))
+        actual = rollup.get(key, (0.0, 0.0))
+        if abs(expected[0] - actual[0]) > tolerance or abs(expected[1] - actual[1]) > tolerance:
+            mismatches.append({
+                "area_id": key[0],
+                "bucket_start": key[1].isoformat(),
+                "raw_total_kwh": expected[0], "rollup_total_kwh": actual[0],
+                "raw_inefficient_kwh": expected[1], "rollup_inefficient_kwh": actual[1],
+            })
+    return mismatches
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+import numpy as np
+from database import db
+from models import Area, LightingUnit, EnergyConsumptionData
+from services.aggregation import resolve_period
+from services.columnar_store import get_columnar_store
+
+def _hour_window_mask(window):
+    # [start_hour, end_hour) op de 24-uurs klok; start > end loopt over middernacht heen
+    start_hour, end_hour = int(window['start_hour']), int(window['end_hour'])
+    if not (0 <= start_hour <= 24 and 0 <= end_hour <= 24):
+        raise ValueError("start_hour and end_hour must be between 0 and 24")
+    hours = np.arange(24)
+    if start_hour <= end_hour:
+        return (hours >= start_hour) & (hours < end_hour)
+    return (hours >= start_hour) | (hours < end_hour)
+
+def validate_scenarios(scenarios):
+    """Controleert de vorm van de scenario definities; ValueError (400 in de route) bij ongeldige invoer."""
+    if not isinstance(scenarios, list) or not scenarios:
+        raise ValueError("scenarios must be a non-empty list")
+    for index, scenario in enumerate(scenarios):
+        if not isinstance(scenario, dict):
+            raise ValueError(f"scenario {index + 1} must be an object")
+        for key in ('dimming', 'switch_off'):
+            windows = scenario.get(key, [])
+            if not isinstance(windows, list) or not all(isinstance(window, dict) for window in windows):
+                raise ValueError(f"scenario {index + 1}: {key} must be a list of objects")
+        if scenario.get('led_retrofit') is not None and not isinstance(scenario['led_retrofit'], dict):
+            raise ValueError(f"scenario {index + 1}: led_retrofit must be an object")
+
+def build_scenario_factors(scenarios, unit_types, power_watt):
+    """Zet scenario definities om naar factoren per uur van de dag (S x 24) en per unit (S x U).
+
+    Ondersteund per scenario: 'dimming' [{percent, start_hour, end_hour}], 'switch_off' [{start_hour, end_hour}]
+    en 'led_retrofit' {unit_type, power_watt}.
+    """
+    hour_factors = np.ones((len(scenarios), 24))
+    unit_factors = np.ones((len(scenarios), len(unit_types)))
+    for index, scenario in enumerate(scenarios):
+        for dimming in scenario.get('dimming', []):
+            percent = float(dimming['percent'])
+            if not 0 <= percent <= 100:
+                raise ValueError("dimming percent must be between 0 and 100")
+            hour_factors[index, _hour_window_mask(dimming)] *= 1 - percent / 100
+        for switch_off in scenario.get('switch_off', []):
+            hour_factors[index, _hour_window_mask(switch_off)] = 0.0
+        retrofit = scenario.get('led_retrofit')
+        if retrofit:
+            target_watt = float(retrofit.get('power_watt', 50))
+            matches = power_watt > target_watt
+            if retrofit.get('unit_type'):
+                matches &= unit_types == retrofit['unit_type']
+            unit_factors[index, matches] = target_watt / power_watt[matches]
+    return hour_factors, unit_factors
+
+def _load_unit_matrix(unit_ids, start_hour, n_hours):
+    store = get_columnar_store()
+    if store is not None:
+        start_offset = store.hour_offset(start_hour)
+        matrix, _ = store.read(unit_ids, start_offset, start_offset + n_hours)
+        return matrix.astype(np.float64)
+
+    matrix = np.zeros((len(unit_ids), n_hours))
+    rows = db.session.query(
+        EnergyConsumptionData.lighting_unit_id,
+        EnergyConsumptionData.timestamp,
+        EnergyConsumptionData.consumption_kwh
+    ).filter(
+        EnergyConsumptionData.lighting_unit_id.in_(unit_ids.tolist()),
+        EnergyConsumptionData.timestamp >= start_hour,
+        EnergyConsumptionData.timestamp < start_hour + timedelta(hours=n_hours)
+    ).all()
+    if rows:
+        row_units, row_timestamps, row_kwh = zip(*rows)
+        unit_positions = np.searchsorted(unit_ids, np.array(row_units, dtype=np.int64))
+        hour_positions = ((np.array(row_timestamps, dtype='datetime64[h]') - np.datetime64(start_hour, 'h'))
+                          .astype(np.int64))
+        np.add.at(matrix, (unit_positions, hour_positions), np.array(row_kwh, dtype=np.float64))
+    return matrix
+
+def simulate_scenarios(scenarios, area_ids=None, city_id=None, period_str='week'):
+    """Evalueert een batch scenario's in één NumPy pass tegen de uurmatrix (units x uren) van de gebieden."""
+    validate_scenarios(scenarios)
+
+    unit_query = db.session.query(LightingUnit.id, LightingUnit.unit_type, LightingUnit.power_watt)
+    if area_ids is not None:
+        unit_query = unit_query.filter(LightingUnit.area_id.in_(area_ids))
+    if city_id is not None:
+        unit_query = unit_query.join(Area).filter(Area.city_id == city_id)
+    units = unit_query.order_by(LightingUnit.id).all()
+    if not units:
+        return None, "No lighting units found"
+
+    end_time = datetime.now()
+    start_time, resolution, label_format = resolve_period(period_str, end_time)
+    # Alleen hele uren binnen [start_time, end_time], zoals bij de andere endpoints
+    start_hour = start_time.replace(minute=0, second=0, microsecond=0)
+    if start_hour < start_time:
+        start_hour += timedelta(hours=1)
+    n_hours = int((end_time - start_hour) // timedelta(hours=1)) + 1
+
+    unit_ids = np.array([unit[0] for unit in units], dtype=np.int64)
+    unit_types = np.array([unit[1] or '' for unit in units], dtype=object)
+    power_watt = np.array([unit[2] or 0 for unit in units], dtype=np.float64)
+    hour_factors, unit_factors = build_scenario_factors(scenarios, unit_types, power_watt)
+    matrix = _load_unit_matrix(unit_ids, start_hour, n_hours)
+
+    # (S x U) @ (U x H) in-process: de BLAS matmul is al multithreaded en de matrix naar workers kopiëren kost meer
+    scenario_hourly = unit_factors @ matrix
+
+    hours = np.datetime64(start_hour, 'h') + np.arange(n_hours)
+    hour_of_day = (start_hour.hour + np.arange(n_hours)) % 24
+    scenario_hourly *= hour_factors[:, hour_of_day]
+    baseline_hourly = matrix.sum(axis=0)
+
+    # Buckets volgens de periode (uur of dag); de uren zijn oplopend dus de buckets zijn aaneengesloten
+    bucket_keys = hours if resolution == 'hour' else hours.astype('datetime64[D]')
+    bucket_labels, bucket_starts = np.unique(bucket_keys, return_index=True)
+    labels = [label.astype(datetime).strftime(label_format) for label in bucket_labels]
+    baseline_buckets = np.add.reduceat(baseline_hourly, bucket_starts)
+    scenario_buckets = np.add.reduceat(scenario_hourly, bucket_starts, axis=1)
+
+    baseline_total = float(baseline_hourly.sum())
+    results = []
+    for index, scenario in enumerate(scenarios):
+        total = float(scenario_buckets[index].sum())
+        results.append({
+            "name": scenario.get('name', f'Scenario {index + 1}'),
+            "total_consumption_kwh": total,
+            "savings_kwh": baseline_total - total,
+            "savings_percentage": (baseline_total - total) / baseline_total * 100 if baseline_total else 0.0,
+            "chart_data": [{"timestamp": label, "consumption_kwh": float(value)}
+                           for label, value in zip(labels, scenario_buckets[index])],
+        })
+
+    return {
+        "period": period_str,
+        "lighting_unit_count": len(unit_ids),
+        "baseline": {
+            "total_consumption_kwh": baseline_total,
+            "chart_data": [{"timestamp": label, "consumption_kwh": float(value)}
+                           for label, value in zip(labels, baseline_buckets)],
+        },
+        "scenarios": results,
+    }, None
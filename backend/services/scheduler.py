@@ -0,0 +1,155 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+from flask import current_app
+from database import db
+from models import LightingUnit, EnergyConsumptionData, ProcessingWatermark
+from sqlalchemy import func
+from services.bulk_loader import upsert_consumption_batch
+from services.rollup_service import refresh_rollups
+from services.recommendation_engine import refresh_recommendations
+from services.anomaly_detector import detect_anomalies, get_anomaly_detector
+from services.retention_service import apply_retention
+from services.watermarks import get_watermark
+
+CATCH_UP_WATERMARK = 'consumption_catch_up'
+
+logger = logging.getLogger('smart_urban_energy.scheduler')
+
+def current_hour():
+    return datetime.now().replace(minute=0, second=0, microsecond=0)
+
+def set_catch_up_watermark(last_hour):
+    """Legt vast tot en met welk uur de verbruiksdata is aangevuld (door de seed of de scheduler)."""
+    watermark = get_watermark(CATCH_UP_WATERMARK)
+    watermark.last_timestamp = last_hour
+    watermark.updated_at = datetime.now()
+    return watermark
+
+def catch_up_consumption(until=None, hours_per_batch=None):
+    """Vult de verbruiksdata aan tot en met het huidige uur, in kleine batches met één commit per batch.
+
+    De watermark wordt in dezelfde transactie als de data bijgewerkt en bestaande metingen worden niet
+    overschreven, dus een afgebroken of dubbele run levert geen dubbele of gewijzigde rijen op.
+    Alleen de echt ingevoegde rijen gaan naar de anomaliedetector en de columnar store.
+    Geeft het aantal ingevoegde rijen terug.
+    """
+    until = until or current_hour()
+    hours_per_batch = hours_per_batch or current_app.config.get('CATCH_UP_HOURS_PER_BATCH', 6)
+    watermark = db.session.get(ProcessingWatermark, CATCH_UP_WATERMARK)
+    if watermark is None:
+        # Eerste run na een bestaande seed: begin na de laatste meting (eenmalige scan)
+        last_timestamp = db.session.query(func.max(EnergyConsumptionData.timestamp)).scalar()
+        if last_timestamp is None:
+            return 0  # nog niet geseed; 'flask seed' maakt de begindata aan
+        watermark = set_catch_up_watermark(last_timestamp.replace(minute=0, second=0, microsecond=0))
+        db.session.commit()
+
+    units = db.session.query(LightingUnit.id, LightingUnit.unit_type, LightingUnit.power_watt).order_by(LightingUnit.id).all()
+    if not units:
+        return 0
+
+    from seed_data import generate_consumption_batches
+    rng = np.random.default_rng()
+    rows_per_batch = current_app.config.get('BULK_LOAD_CHUNK_SIZE', 50000)
+    written = 0
+    while watermark.last_timestamp < until:
+        start_time = watermark.last_timestamp + timedelta(hours=1)
+        end_time = min(until, start_time + timedelta(hours=hours_per_batch - 1))
+        for batch in generate_consumption_batches(units, start_time, end_time, rng, rows_per_batch=rows_per_batch):
+            inserted = upsert_consumption_batch(batch, overwrite=False)
+            if inserted:
+                detect_anomalies([row['lighting_unit_id'] for row in inserted], [row['timestamp'] for row in inserted],
+                                 [row['consumption_kwh'] for row in inserted])
+            written += len(inserted)
+        set_catch_up_watermark(end_time)
+        db.session.commit()
+    return written
+
+def run_catch_up_cycle():
+    """Eén ronde: nieuwe uren aanvullen (met anomaliedetectie), rollups en aanbevelingen bijwerken en
+    dagen buiten het retentievenster compacteren (een no-op zolang er geen nieuwe dag over de grens gaat)."""
+    written = catch_up_consumption()
+    touched_areas = refresh_rollups() if written else set()
+    recommendations = refresh_recommendations() if touched_areas else 0
+    detector = get_anomaly_detector()
+    if detector is not None and written:
+        detector.snapshot()
+    retention = apply_retention()
+    return {"rows": written, "areas": len(touched_areas), "recommendations": recommendations, **retention}
+
+def catch_up_lag_hours():
+    """Aantal hele uren tussen het huidige uur en het laatst aangevulde uur (None als er nog niets is aangevuld)."""
+    watermark = db.session.get(ProcessingWatermark, CATCH_UP_WATERMARK)
+    if watermark is None or watermark.last_timestamp is None:
+        return None
+    return int((current_hour() - watermark.last_timestamp) // timedelta(hours=1))
+
+class CatchUpScheduler:
+    """Achtergrond thread die periodiek run_catch_up_cycle draait terwijl de app verkeer afhandelt.
+
+    Draai hem in één proces per database; de rijen zelf zijn idempotent, maar gelijktijdige rollup runs
+    doen dubbel werk.
+    """
+
+    def __init__(self, app, interval_seconds):
+        self.app = app
+        self.interval_seconds = interval_seconds
+        self.last_run = None
+        self.last_result = None
+        self.last_error = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='catch-up-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval_seconds)
+
+    def run_once(self):
+        with self.app.app_context():
+            try:
+                self.last_result = run_catch_up_cycle()
+                self.last_error = None
+                if self.last_result["rows"]:
+                    logger.info("Catch-up appended %(rows)s rows for %(areas)s areas.", self.last_result)
+            except Exception as exc:
+                db.session.rollback()
+                self.last_error = str(exc)
+                logger.exception("Catch-up cycle failed")
+            self.last_run = datetime.now()
+        return self.last_result
+
+def get_scheduler():
+    return current_app.extensions.get('catch_up_scheduler')
+
+def init_scheduler(app, start=False):
+    """Registreert de lag gauge en start (optioneel) de catch-up thread; hooguit één keer per app."""
+    from instrumentation import metrics
+    metrics.gauges['data_catch_up_lag_hours'] = catch_up_lag_hours
+    if not start or not app.config.get('CATCH_UP_SCHEDULER_ENABLED', True):
+        return None
+    scheduler = app.extensions.get('catch_up_scheduler')
+    if scheduler is None:
+        scheduler = app.extensions['catch_up_scheduler'] = CatchUpScheduler(
+            app, app.config.get('CATCH_UP_INTERVAL_SECONDS', 300)
+        )
+    scheduler.start()
+    return scheduler
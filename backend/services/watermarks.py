@@ -0,0 +1,10 @@
+from database import db
+from models import ProcessingWatermark
+
+def get_watermark(name):
+    """Haalt de watermark met deze naam op en maakt hem aan (nog zonder tijdstip) als hij nog niet bestaat."""
+    watermark = db.session.get(ProcessingWatermark, name)
+    if watermark is None:
+        watermark = ProcessingWatermark(name=name)
+        db.session.add(watermark)
+    return watermark
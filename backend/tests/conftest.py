@@ -0,0 +1,30 @@
+# backend/tests/conftest.py
+
+import pytest
+from app import create_app
+from config import Config
+from database import db
+from seed_data import seed_initial_data
+
+@pytest.fixture
+def app(tmp_path):
+    """Verse SQLite database per test, geseed met een paar dagen demo data (ruwe tabel + rollups)."""
+    class TestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'test.db'}"
+        ENERGY_STORAGE_ENGINE = 'sql'
+        ENERGY_CACHE_BACKEND = 'none'
+        COLUMNAR_STORE_PATH = str(tmp_path / 'columnar')
+        ANOMALY_STATE_PATH = str(tmp_path / 'anomaly_state.npz')
+        CATCH_UP_SCHEDULER_ENABLED = False
+        METRICS_ENABLED = False
+        SEED_DAYS = 4
+        SEED_RANDOM_SEED = 1
+        RAW_RETENTION_DAYS = 1
+        RETENTION_DELETE_BATCH_SIZE = 500
+
+    app = create_app(TestConfig)
+    with app.app_context():
+        db.create_all()
+        seed_initial_data(reset=True)
+        yield app
+        db.session.remove()
@@ -0,0 +1,40 @@
+import io
+import json
+from datetime import datetime, timedelta
+from database import db
+from models import LightingUnit, EnergyConsumptionData
+from services.ingest_service import ingest_readings
+from services.rollup_service import check_rollup_consistency
+
+def _ndjson(*records):
+    lines = [record if isinstance(record, str) else json.dumps(record) for record in records]
+    return io.BytesIO('\n'.join(lines).encode('utf-8'))
+
+def _stored_kwh(unit_id, timestamp):
+    row = EnergyConsumptionData.query.filter_by(lighting_unit_id=unit_id, timestamp=timestamp).one()
+    return row.consumption_kwh
+
+def test_ingest_upserts_dedups_and_rejects(app):
+    unit_id = db.session.query(LightingUnit.id).order_by(LightingUnit.id).first()[0]
+    existing_hour = datetime.now().replace(minute=0, second=0, microsecond=0) - timedelta(hours=3)
+    new_hour = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(hours=2)
+    rows_before = EnergyConsumptionData.query.count()
+
+    result = ingest_readings(_ndjson(
+        {"lighting_unit_id": unit_id, "timestamp": existing_hour.isoformat(), "consumption_kwh": 0.7},
+        {"lighting_unit_id": unit_id, "timestamp": new_hour.isoformat(), "consumption_kwh": 0.1},
+        # Zelfde sleutel in dezelfde batch: de laatste wint
+        {"lighting_unit_id": unit_id, "timestamp": new_hour.isoformat(), "consumption_kwh": 0.2},
+        {"lighting_unit_id": 999999, "timestamp": new_hour.isoformat(), "consumption_kwh": 0.1},
+        {"lighting_unit_id": unit_id, "timestamp": new_hour.isoformat(), "consumption_kwh": -1},
+        '{"lighting_unit_id": %d, "timestamp": "%s", "consumption_kwh": Infinity}' % (unit_id, new_hour.isoformat()),
+        {"lighting_unit_id": unit_id, "timestamp": new_hour.isoformat()},
+        'geen json',
+    ))
+
+    assert result["accepted"] == 2
+    assert result["rejected"] == 5
+    assert EnergyConsumptionData.query.count() == rows_before + 1
+    assert _stored_kwh(unit_id, existing_hour) == 0.7
+    assert _stored_kwh(unit_id, new_hour) == 0.2
+    assert check_rollup_consistency() == []
@@ -0,0 +1,50 @@
+import io
+import json
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func
+from database import db
+from models import Area, LightingUnit, EnergyConsumptionData, DailyUnitConsumption
+from services.aggregation import aggregate_rollups, resolve_time_range
+from services.ingest_service import ingest_readings
+from services.retention_service import apply_retention, compacted_through
+from services.rollup_service import check_rollup_consistency
+
+def _raw_total():
+    return db.session.query(func.sum(EnergyConsumptionData.consumption_kwh)).scalar() or 0.0
+
+def test_retention_boundary_round_trip(app):
+    area_ids = [area_id for (area_id,) in Area.query.with_entities(Area.id).order_by(Area.id)]
+    end_time = datetime.now()
+    start_time = end_time - timedelta(days=30)
+    series_before = aggregate_rollups(area_ids, start_time, end_time, 'day')
+    total_before = _raw_total()
+
+    # Retentie draait alsof het een maand later is: de oudste seed dagen vallen buiten het venster
+    result = apply_retention(now=end_time + timedelta(days=30))
+    boundary = compacted_through()
+
+    assert result["compacted_days"] > 0 and result["deleted_rows"] > 0
+    assert boundary is not None
+    assert EnergyConsumptionData.query.filter(EnergyConsumptionData.timestamp < boundary).count() == 0
+    assert EnergyConsumptionData.query.filter(EnergyConsumptionData.timestamp >= boundary).count() > 0
+    compacted_total = db.session.query(func.sum(DailyUnitConsumption.total_kwh)).scalar()
+    assert _raw_total() + compacted_total == pytest.approx(total_before)
+
+    # De rollups houden de volledige historie; de reeksen veranderen niet
+    series_after = aggregate_rollups(area_ids, start_time, end_time, 'day')
+    assert [row[:2] for row in series_after] == [row[:2] for row in series_before]
+    assert [row[2] for row in series_after] == pytest.approx([row[2] for row in series_before])
+    assert check_rollup_consistency() == []
+
+    # Vóór de grens: geen kwartieren en geen losse ruwe metingen meer
+    with pytest.raises(ValueError):
+        resolve_time_range('week', boundary - timedelta(hours=1), end_time, '15min')
+    unit_id = db.session.query(LightingUnit.id).order_by(LightingUnit.id).first()[0]
+    record = {"lighting_unit_id": unit_id, "timestamp": (boundary - timedelta(hours=1)).isoformat(), "consumption_kwh": 0.1}
+    rejected = ingest_readings(io.BytesIO(json.dumps(record).encode('utf-8')))
+    assert rejected["accepted"] == 0 and rejected["rejected"] == 1
+
+    # Een tweede run met dezelfde klok doet niets meer
+    again = apply_retention(now=end_time + timedelta(days=30))
+    assert again == {"compacted_days": 0, "deleted_rows": 0, "deleted_events": 0}
@@ -0,0 +1,23 @@
+from datetime import datetime
+import pytest
+from models import Area
+from services.aggregation import resolve_period, aggregate_raw, aggregate_rollups
+from services.rollup_service import check_rollup_consistency
+
+@pytest.mark.parametrize('period', ['day', 'week', 'month'])
+def test_rollups_match_raw_aggregation(app, period):
+    area_ids = [area_id for (area_id,) in Area.query.with_entities(Area.id).order_by(Area.id)]
+    end_time = datetime.now()
+    start_time, resolution, _ = resolve_period(period, end_time)
+
+    raw = aggregate_raw(area_ids, start_time, end_time, resolution)
+    rollups = aggregate_rollups(area_ids, start_time, end_time, resolution)
+
+    assert raw
+    assert [row[:2] for row in rollups] == [row[:2] for row in raw]
+    for expected, actual in zip(raw, rollups):
+        assert actual[2] == pytest.approx(expected[2])
+        assert actual[3] == pytest.approx(expected[3])
+
+def test_rollups_consistent_after_seed(app):
+    assert check_rollup_consistency() == []